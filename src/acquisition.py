@@ -1,145 +1,569 @@
+import hashlib
 import logging
+import math
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
+import pyarrow.feather as feather
 import vectorbt as vbt
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import Retrying, retry, stop_after_attempt, wait_exponential
+
+from cache_manifest import CacheManifest
+from gap_fill import GapMask, check_policy, fill_frame
+from rate_limiter import FRED_REQUESTS_PER_MINUTE, TokenBucket
+from saving import DataSaver
 
 
 class YahooAcquisition:
-    def __init__(self, tickers, start_date, end_date, output_dir):
+    FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+    def __init__(
+        self,
+        tickers,
+        start_date,
+        end_date,
+        output_dir,
+        max_workers=1,
+        retries=3,
+        batch_size=1,
+        cache_dir=None,
+        cache_ttl=None,
+        downloader=None,
+        cache_max_bytes=None,
+        missing_data_handling="forward_fill",
+        output_formats=None,
+    ):
         self.tickers = tickers
         self.start_date = start_date
         self.end_date = end_date
         self.output_dir = output_dir
+        self.output_formats = output_formats
+        self.max_workers = max_workers
+        self.retries = retries
+        self.batch_size = batch_size
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.manifest = (
+            CacheManifest.for_dir(cache_dir, cache_max_bytes) if cache_dir else None
+        )
+        self.downloader = downloader
+        self.missing_data_handling = check_policy(missing_data_handling)
+        self.failed_tickers = []
+        self.gap_mask = None
+        # First stored date an incremental refresh replaced, None after a full fetch
+        self.refresh_start = None
 
-    def fetch_data(self):
-        """Fetch Yahoo Finance data using vectorbt."""
-        logging.info(f"Fetching Yahoo Finance data for tickers: {self.tickers}")
-        valid_tickers = []
-        dataframes = []
+    def _download(self, symbols, start=None):
+        """Download one or more symbols with vectorbt, retrying transient failures."""
+        for attempt in Retrying(
+            stop=stop_after_attempt(self.retries),
+            wait=wait_exponential(multiplier=1, min=2, max=10),
+            reraise=True,
+        ):
+            with attempt:
+                download = self.downloader or vbt.YFData.download
+                return download(
+                    symbols, start=start or self.start_date, end=self.end_date
+                )
 
-        for ticker in self.tickers:
+    def fetch_ticker(self, ticker, start=None):
+        """Download a single ticker into its Field_TICKER columns."""
+        yf_data = self._download(ticker.strip().upper(), start)
+        if yf_data is None:
+            return None
+
+        ticker_data = pd.DataFrame(
+            {
+                "Date": yf_data.get("Close").index,  # Use Close to get the index
+                **{f"{field}_{ticker}": yf_data.get(field) for field in self.FIELDS},
+            }
+        )
+        ticker_data.set_index("Date", inplace=True)  # Explicitly set Date as index
+        return ticker_data
+
+    def fetch_batch(self, tickers, start=None):
+        """Download several tickers in one request and split them into Field_TICKER columns."""
+        symbols = [ticker.strip().upper() for ticker in tickers]
+        yf_data = self._download(symbols, start)
+        if yf_data is None:
+            return None
+
+        # vectorbt returns one (date x symbol) frame per field; stack them under
+        # a (field, symbol) header and reorder to the ticker-major layout at once
+        data = pd.concat(yf_data.get(self.FIELDS), axis=1, keys=self.FIELDS)
+        data = data.reindex(
+            columns=pd.MultiIndex.from_tuples(
+                [(field, symbol) for symbol in symbols for field in self.FIELDS]
+            )
+        )
+        data.columns = [
+            f"{field}_{ticker}" for ticker in tickers for field in self.FIELDS
+        ]
+        data.index.name = "Date"
+        return data
+
+    def _fetch_one(self, ticker, start=None):
+        """Fetch a ticker, logging and swallowing failures."""
+        try:
+            ticker_data = self.fetch_ticker(ticker, start)
+            if ticker_data is None:
+                logging.warning(f"No data found for ticker: {ticker}")
+            return ticker_data
+        except Exception as e:
+            logging.warning(f"Failed to fetch data for ticker {ticker}: {e}")
+            return None
+
+    def _cache_path(self, ticker, start=None):
+        """Build the cache file path for a ticker, date range and field set."""
+        sanitized_start_date = pd.Timestamp(start or self.start_date).strftime(
+            "%Y-%m-%d"
+        )
+        sanitized_end_date = pd.Timestamp(self.end_date).strftime("%Y-%m-%d")
+        key = f"{ticker}|{sanitized_start_date}|{sanitized_end_date}|{','.join(self.FIELDS)}"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:10]
+        safe_ticker = re.sub(r"[^A-Za-z0-9.-]", "", ticker)
+        return os.path.join(
+            self.cache_dir,
+            f"yahoo_{safe_ticker}_{sanitized_start_date}_{sanitized_end_date}_{digest}.parquet",
+        )
+
+    def _load_cached(self, ticker, start=None):
+        """Return the cached frame for a ticker, or None if missing or expired."""
+        if not self.cache_dir:
+            return None
+        cache_path = self._cache_path(ticker, start)
+        if not os.path.exists(cache_path):
+            return None
+        if not self.manifest.is_valid(cache_path):
+            logging.warning(f"Discarding corrupt cache file {cache_path}")
+            self.manifest.remove(cache_path)
+            return None
+        age = time.time() - os.path.getmtime(cache_path)
+        if self.cache_ttl is not None and age > self.cache_ttl:
+            logging.info(f"Cached data for ticker {ticker} expired ({age:.0f}s old)")
+            return None
+        logging.info(f"Loading cached data for ticker {ticker}")
+        self.manifest.touch(cache_path)
+        return pd.read_parquet(cache_path)
+
+    def _store_cached(self, frames, tickers, start=None):
+        """Write each fetched ticker's columns to its own cache file."""
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for frame in frames:
+            for ticker in tickers:
+                columns = [f"{field}_{ticker}" for field in self.FIELDS]
+                if columns[0] not in frame.columns:
+                    continue
+                cache_path = self._cache_path(ticker, start)
+                frame[columns].dropna(how="all").to_parquet(cache_path, index=True)
+                self.manifest.record(cache_path)
+                logging.info(f"Saved Yahoo ticker {ticker} to cache: {cache_path}")
+
+    def _fetch_group(self, tickers, start=None):
+        """Fetch a group of tickers, serving cached tickers from disk."""
+        cached = {ticker: self._load_cached(ticker, start) for ticker in tickers}
+        misses = [ticker for ticker in tickers if cached[ticker] is None]
+        frames, failed = self._download_group(misses, start) if misses else ([], [])
+        self._store_cached(frames, misses, start)
+
+        hits = [frame for frame in cached.values() if frame is not None]
+        if not hits:
+            return frames, failed
+
+        # Put cached and freshly fetched tickers back into ticker order
+        data = pd.concat(hits + frames, axis=1, sort=True)
+        columns = [
+            f"{field}_{ticker}"
+            for ticker in tickers
+            if ticker not in failed
+            for field in self.FIELDS
+        ]
+        return [data[columns]], failed
+
+    def _download_group(self, tickers, start=None):
+        """Download a group of tickers, falling back to per-symbol fetches if a batch fails."""
+        if len(tickers) > 1:
             try:
-                yf_data = vbt.YFData.download(
-                    ticker.strip().upper(),
-                    start=self.start_date,
-                    end=self.end_date,
-                )
-                if yf_data is not None:
-                    ticker_data = pd.DataFrame(
-                        {
-                            "Date": yf_data.get(
-                                "Close"
-                            ).index,  # Use Close to get the index
-                            f"Open_{ticker}": yf_data.get("Open"),
-                            f"High_{ticker}": yf_data.get("High"),
-                            f"Low_{ticker}": yf_data.get("Low"),
-                            f"Close_{ticker}": yf_data.get("Close"),
-                            f"Volume_{ticker}": yf_data.get("Volume"),
-                        }
-                    )
-                    ticker_data.set_index(
-                        "Date", inplace=True
-                    )  # Explicitly set Date as index
-                    dataframes.append(ticker_data)
-                    valid_tickers.append(ticker)
-                else:
-                    logging.warning(f"No data found for ticker: {ticker}")
+                data = self.fetch_batch(tickers, start)
+                if data is not None:
+                    return [data], []
+                logging.warning(f"No data found for batch: {tickers}")
             except Exception as e:
-                logging.warning(f"Failed to fetch data for ticker {ticker}: {e}")
+                logging.warning(
+                    f"Batch fetch failed for {tickers}, falling back to per-symbol: {e}"
+                )
+
+        frames, failed = [], []
+        for ticker in tickers:
+            ticker_data = self._fetch_one(ticker, start)
+            if ticker_data is None:
+                failed.append(ticker)
+            else:
+                frames.append(ticker_data)
+        return frames, failed
+
+    def _fetch_groups(self, groups, starts=None):
+        """Fetch ticker groups serially or on a bounded thread pool, preserving order."""
+        starts = starts or [None] * len(groups)
+        if self.max_workers > 1 and len(groups) > 1:
+            logging.info(
+                f"Fetching {len(groups)} ticker groups with {self.max_workers} workers"
+            )
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(self._fetch_group, groups, starts))
+        return [self._fetch_group(group, start) for group, start in zip(groups, starts)]
+
+    def _batches(self, tickers):
+        """Split tickers into download groups of at most batch_size symbols.
+
+        vbt.YFData.download still requests the symbols of a group one after
+        another, so groups are also capped to leave one for every worker.
+        """
+        per_worker = math.ceil(len(tickers) / max(1, self.max_workers))
+        batch_size = max(1, min(self.batch_size, per_worker))
+        return [tickers[i : i + batch_size] for i in range(0, len(tickers), batch_size)]
+
+    def _collect(self, results):
+        """Record failed tickers and return the fetched frames."""
+        dataframes = [frame for frames, _ in results for frame in frames]
+        self.failed_tickers = [ticker for _, failed in results for ticker in failed]
+        if self.failed_tickers:
+            logging.warning(f"Failed to fetch tickers: {self.failed_tickers}")
+        return dataframes
+
+    def fetch_data(self):
+        """Fetch Yahoo Finance data using vectorbt."""
+        logging.info(f"Fetching Yahoo Finance data for tickers: {self.tickers}")
+        dataframes = self._collect(self._fetch_groups(self._batches(self.tickers)))
 
         if not dataframes:
             raise RuntimeError("No valid data fetched for any ticker.")
 
         # Combine all ticker data into a single DataFrame
-        data = pd.concat(dataframes, axis=1)
+        data = dataframes[0] if len(dataframes) == 1 else pd.concat(dataframes, axis=1)
         data = data[~data.index.duplicated(keep="first")]  # Drop duplicate indices
-        data = data.ffill().bfill()  # Fill missing data
+        # Fill missing data, remembering which cells were filled
+        self.gap_mask = fill_frame(data, self.missing_data_handling)
         logging.debug(f"Fetched Yahoo data structure: {data.head()}")
         logging.info(f"Fetched data with valid columns: {data.columns}")
         return data
 
-    def save_data(self, data):
-        """Save Yahoo Finance data to CSV and Parquet formats."""
-        csv_path = os.path.join(self.output_dir, "yahoo_data.csv")
-        parquet_path = os.path.join(self.output_dir, "yahoo_data.parquet")
+    def tail_starts(self, stored, overlap_days=5):
+        """Return the first date to re-fetch for each ticker given the raw stored data.
 
-        data.to_csv(csv_path, index=True)
-        logging.info(f"Saved Yahoo Finance data to {csv_path}")
+        Cells the gap policy filled must already be NaN again in `stored`, so only
+        bars Yahoo actually returned count towards the overlap.
+        """
+        starts = {}
+        for ticker in self.tickers:
+            column = f"Close_{ticker}"
+            dates = stored[column].dropna().index if column in stored else []
+            if len(dates) == 0:
+                starts[ticker] = self.start_date
+            else:
+                # Re-fetch the last `overlap_days` stored bars to pick up revisions
+                starts[ticker] = dates[-min(overlap_days + 1, len(dates))]
+        return starts
 
-        data.to_parquet(parquet_path, index=True)
-        logging.info(f"Saved Yahoo Finance data to {parquet_path}")
+    def load_raw(self, stored):
+        """The stored frame with the cells its saved gap mask marks set back to NaN.
 
-    def save_data(self, data):
-        """Save Yahoo Finance data to CSV and Parquet formats."""
-        csv_path = os.path.join(self.output_dir, "yahoo_data.csv")
-        parquet_path = os.path.join(self.output_dir, "yahoo_data.parquet")
+        Without a mask matching the stored rows, the frame is taken as it is.
+        """
+        mask_path = os.path.join(self.output_dir, "yahoo_data_gap_mask.npz")
+        if not os.path.exists(mask_path):
+            return stored
+        gap_mask = GapMask.load(mask_path)
+        if gap_mask.rows != len(stored) or not set(gap_mask.columns) <= set(stored):
+            logging.warning(f"Ignoring {mask_path}, which no longer matches the data")
+            return stored
+        filled = gap_mask.to_frame(stored.index)
+        return stored.mask(filled.reindex(columns=stored.columns, fill_value=False))
+
+    def fetch_incremental(self, stored_path=None, overlap_days=5):
+        """Fetch only the missing tail of each ticker and combine it with stored data.
+
+        Returns the whole refreshed frame. When its columns match the stored ones,
+        `refresh_start` is set to the first re-fetched date, and `save_data` then
+        only appends the rows from there on.
+        """
+        self.refresh_start = None
+        stored_path = stored_path or os.path.join(self.output_dir, "yahoo_data.parquet")
+        if not os.path.exists(stored_path):
+            logging.info(
+                f"No stored Yahoo data at {stored_path}, fetching full history"
+            )
+            return self.fetch_data()
+
+        stored = self.load_raw(pd.read_parquet(stored_path))
+        starts = self.tail_starts(stored, overlap_days)
+        logging.info(f"Refreshing Yahoo data incrementally from {stored_path}")
+
+        # Tickers sharing a start date can still be batched together
+        by_start = {}
+        for ticker, start in starts.items():
+            by_start.setdefault(start, []).append(ticker)
+        groups, group_starts = [], []
+        for start, tickers in by_start.items():
+            for batch in self._batches(tickers):
+                groups.append(batch)
+                group_starts.append(start)
+        dataframes = self._collect(self._fetch_groups(groups, group_starts))
+
+        if not dataframes:
+            logging.warning("No new Yahoo data fetched, keeping stored data")
+            self.gap_mask = fill_frame(stored, self.missing_data_handling)
+            return stored
+
+        fresh = pd.concat(dataframes, axis=1, sort=True)
+        fresh = fresh[~fresh.index.duplicated(keep="first")]
+        # Fetched bars overwrite the overlapping stored bars, new rows are appended
+        columns = list(stored.columns) + [
+            column for column in fresh.columns if column not in stored.columns
+        ]
+        data = fresh.combine_first(stored).reindex(columns=columns)
+        # Filled as a whole, so gaps spanning the old and new rows fill as in one piece
+        self.gap_mask = fill_frame(data, self.missing_data_handling)
+        # combine_first upcasts integer columns such as Volume; restore them once filled
+        dtypes = stored.dtypes.to_dict()
+        for frame in dataframes:
+            dtypes.update(frame.dtypes.to_dict())
+        data = data.astype(
+            {
+                column: dtypes[column]
+                for column in data.columns
+                if not data[column].hasnans
+            }
+        )
+        if columns == list(stored.columns):
+            self.refresh_start = min(pd.Timestamp(start) for start in starts.values())
+        logging.info(
+            f"Appended {len(data.index.difference(stored.index))} new rows to stored Yahoo data"
+        )
+        return data
 
-        data.to_csv(csv_path, index=True)
-        logging.info(f"Saved Yahoo Finance data to {csv_path}")
+    def save_data(self, data):
+        """Save Yahoo Finance data in the configured output formats.
 
-        data.to_parquet(parquet_path, index=True)
-        logging.info(f"Saved Yahoo Finance data to {parquet_path}")
+        After an incremental refresh only the rows from `refresh_start` on are
+        appended to the stored outputs.
+        """
+        if self.refresh_start is not None:
+            return DataSaver.append_data(
+                data.loc[self.refresh_start :],
+                self.output_dir,
+                name="yahoo_data",
+                formats=self.output_formats,
+            )
+        return DataSaver.save_data(
+            data, self.output_dir, name="yahoo_data", formats=self.output_formats
+        )
 
 
 class FredAcquisition:
-    def __init__(self, api_key, cache_dir, missing_data_handling="interpolate"):
+    # Cache file formats, by file extension
+    CACHE_FORMATS = ("csv", "feather")
+
+    def __init__(
+        self,
+        api_key,
+        cache_dir,
+        fred_client=None,
+        max_workers=1,
+        requests_per_minute=FRED_REQUESTS_PER_MINUTE,
+        cache_format="feather",
+        cache_max_bytes=None,
+    ):
         self.api_key = api_key
         self.cache_dir = cache_dir
-        self.missing_data_handling = missing_data_handling
-        from fredapi import Fred
+        self.max_workers = max_workers
+        if cache_format not in self.CACHE_FORMATS:
+            raise ValueError(f"Unsupported cache_format: {cache_format}")
+        self.cache_format = cache_format
+        self.manifest = CacheManifest.for_dir(cache_dir, cache_max_bytes)
+        # Shared by every worker so the whole process stays under FRED's limit
+        self.rate_limiter = TokenBucket.per_minute(requests_per_minute)
+        if fred_client is None:
+            from fredapi import Fred
+
+            fred_client = Fred(api_key=self.api_key)
+        self.fred = fred_client
 
-        self.fred = Fred(api_key=self.api_key)
+    def cached_ranges(self, series_id):
+        """List the (start, end, path) of every cached file for a series."""
+        date = r"\d{4}-\d{2}-\d{2}"
+        extensions = "|".join(self.CACHE_FORMATS)
+        pattern = re.compile(
+            rf"^{re.escape(series_id)}_({date})_({date})\.({extensions})$"
+        )
+        if not os.path.isdir(self.cache_dir):
+            return []
+        ranges = []
+        for file_name in os.listdir(self.cache_dir):
+            match = pattern.match(file_name)
+            if match:
+                path = os.path.join(self.cache_dir, file_name)
+                if not self.manifest.is_valid(path):
+                    logging.warning(f"Discarding corrupt cache file {path}")
+                    self.manifest.remove(path)
+                    continue
+                if match.group(3) != self.cache_format:
+                    path = self._migrate_cache(path)
+                ranges.append(
+                    (pd.Timestamp(match.group(1)), pd.Timestamp(match.group(2)), path)
+                )
+        return sorted(ranges)
+
+    @staticmethod
+    def missing_ranges(ranges, start, end):
+        """Return the sub-ranges of [start, end] not covered by any cached range."""
+        gaps = []
+        cursor = start
+        for cached_start, cached_end, _ in sorted(ranges):
+            if cached_end < cursor:
+                continue
+            if cached_start > end:
+                break
+            if cached_start > cursor:
+                gaps.append((cursor, cached_start - pd.Timedelta(days=1)))
+            cursor = max(cursor, cached_end + pd.Timedelta(days=1))
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def _read_cache(self, path):
+        """Read a cached series; Feather files are memory-mapped instead of parsed."""
+        if path.endswith(".feather"):
+            table = feather.read_table(path, memory_map=True)
+            return table.to_pandas().set_index("Date")
+        return pd.read_csv(path, index_col="Date", parse_dates=True)
+
+    def _write_cache(self, df, path):
+        if path.endswith(".feather"):
+            # Uncompressed so readers can memory-map the columns directly
+            df.reset_index().to_feather(path, compression="uncompressed")
+        else:
+            df.to_csv(path)
+
+    def _migrate_cache(self, path):
+        """Rewrite a cached file in the configured format and return its new path."""
+        new_path = f"{os.path.splitext(path)[0]}.{self.cache_format}"
+        self._write_cache(self._read_cache(path), new_path)
+        self.manifest.record(new_path)
+        self.manifest.remove(path)
+        logging.info(f"Migrated FRED cache file {path} to {new_path}")
+        return new_path
+
+    def _fetch_from_api(self, series_id, start_date, end_date):
+        """Download a series range as a Date-indexed Value frame."""
+        self.rate_limiter.acquire()
+        series = self.fred.get_series(
+            series_id, observation_start=start_date, observation_end=end_date
+        )
+        df = series.reset_index()
+        df.columns = ["Date", "Value"]
+        df.set_index("Date", inplace=True)
+        return df
 
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
     )
     def fetch_series(self, series_id, start_date, end_date):
-        """Fetch a FRED series and cache the result."""
+        """Fetch a FRED series, serving any cached range that covers the request."""
         logging.info(
             f"Fetching FRED series {series_id} from {start_date} to {end_date}"
         )
-        sanitized_start_date = pd.Timestamp(start_date).strftime("%Y-%m-%d")
-        sanitized_end_date = pd.Timestamp(end_date).strftime("%Y-%m-%d")
-        cache_path = os.path.join(
-            self.cache_dir,
-            f"{series_id}_{sanitized_start_date}_{sanitized_end_date}.csv",
-        )
+        start = pd.Timestamp(start_date).normalize().tz_localize(None)
+        end = pd.Timestamp(end_date).normalize().tz_localize(None)
+        ranges = self.cached_ranges(series_id)
 
-        # Use cached data if available
-        if os.path.exists(cache_path):
-            logging.info(f"Loading cached data for series {series_id}")
-            return pd.read_csv(cache_path, index_col="Date", parse_dates=True)
+        # Serve from the smallest cached range that fully covers the request
+        covering = [r for r in ranges if r[0] <= start and r[1] >= end]
+        if covering:
+            path = min(covering, key=lambda r: os.path.getsize(r[2]))[2]
+            logging.info(f"Loading cached data for series {series_id} from {path}")
+            self.manifest.touch(path)
+            return self._read_cache(path).loc[start:end]
 
-        # Fetch from API
+        # Fetch only the gaps of the requested window
+        gaps = self.missing_ranges(ranges, start, end)
         try:
-            series = self.fred.get_series(
-                series_id, observation_start=start_date, observation_end=end_date
-            )
-            if series.empty:
-                logging.warning(f"No data found for series {series_id}")
-                return pd.DataFrame(columns=["Date", "Value"]).set_index("Date")
-
-            # Format and save data
-            df = series.reset_index()
-            df.columns = ["Date", "Value"]
-            df.set_index("Date", inplace=True)
-            df.to_csv(cache_path)
-            logging.info(f"Saved FRED series {series_id} to cache: {cache_path}")
-            return df
+            fetched = [
+                self._fetch_from_api(series_id, gap_start, gap_end)
+                for gap_start, gap_end in gaps
+            ]
         except Exception as e:
             logging.error(f"Failed to fetch series {series_id}: {e}", exc_info=True)
             raise RuntimeError(f"Error fetching FRED series {series_id}: {e}")
+        logging.info(f"Fetched {len(gaps)} missing ranges for series {series_id}")
+
+        # Consolidate the cached ranges overlapping or touching the window into one
+        # file; disjoint ones keep their own files, as their gap was never fetched
+        cache_start, cache_end = start, end
+        day = pd.Timedelta(days=1)
+        merged = []
+        while touching := [
+            r
+            for r in ranges
+            if r not in merged and r[0] <= cache_end + day and r[1] >= cache_start - day
+        ]:
+            merged += touching
+            cache_start = min([cache_start] + [r[0] for r in touching])
+            cache_end = max([cache_end] + [r[1] for r in touching])
+
+        frames = [self._read_cache(r[2]) for r in merged] + fetched
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            logging.warning(f"No data found for series {series_id}")
+            return pd.DataFrame(columns=["Date", "Value"]).set_index("Date")
+        df = pd.concat(frames)
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+
+        cache_path = os.path.join(
+            self.cache_dir,
+            f"{series_id}_{cache_start:%Y-%m-%d}_{cache_end:%Y-%m-%d}.{self.cache_format}",
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._write_cache(df, cache_path)
+        self.manifest.record(cache_path)
+        for _, _, path in merged:
+            if path != cache_path:
+                self.manifest.remove(path)
+        logging.info(f"Saved FRED series {series_id} to cache: {cache_path}")
+        return df.loc[start:end]
+
+    def _fetch_ohlcv(self, series_id, start_date, end_date):
+        logging.info(f"Fetching FRED series: {series_id}")
+        series_data = self.fetch_series(series_id, start_date, end_date)
+        # Gaps are left for DataMerger, which fills them per series after alignment
+        # and never before an as-of lookup could see later observations
+        return self.transform_to_ohlcv(series_data)
 
     def fetch_all_series(self, series_ids, start_date, end_date):
-        """Fetch and structure multiple FRED series."""
+        """Fetch and structure multiple FRED series, in parallel if max_workers > 1."""
+        if self.max_workers > 1 and len(series_ids) > 1:
+            logging.info(
+                f"Fetching {len(series_ids)} FRED series with {self.max_workers} workers"
+            )
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = executor.map(
+                    lambda series_id: self._fetch_ohlcv(
+                        series_id, start_date, end_date
+                    ),
+                    series_ids,
+                )
+                return dict(zip(series_ids, results))
+
         fred_data_dict = {}
         for series_id in series_ids:
-            logging.info(f"Fetching FRED series: {series_id}")
-            series_data = self.fetch_series(series_id, start_date, end_date)
-            ohlcv_data = self.transform_to_ohlcv(series_data)
-            fred_data_dict[series_id] = ohlcv_data
+            fred_data_dict[series_id] = self._fetch_ohlcv(
+                series_id, start_date, end_date
+            )
         return fred_data_dict
 
     def transform_to_ohlcv(self, df):
@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from compact import memory_bytes
+from saving import ArrowSink, DataSaver, remove_path
+
+
+def is_frame_dict(value):
+    return isinstance(value, dict) and all(
+        isinstance(frame, pd.DataFrame) for frame in value.values()
+    )
+
+
+def write_frames(value, path):
+    """Write a frame to an Arrow file, or a dict of frames to a directory of them.
+
+    Returns the keys of a dict, which `read_frames` needs to rebuild it, or None.
+    """
+
+    def write(temp_path):
+        if isinstance(value, pd.DataFrame):
+            ArrowSink().write(value, temp_path)
+            return
+        os.makedirs(temp_path)
+        for i, frame in enumerate(value.values()):
+            ArrowSink().write(frame, os.path.join(temp_path, f"{i}.arrow"))
+
+    DataSaver.write_atomic(path, write)
+    return None if isinstance(value, pd.DataFrame) else list(value)
+
+
+def read_frames(path, keys=None):
+    """Memory-map what `write_frames` wrote to `path`."""
+    if keys is None:
+        return DataSaver.load_arrow(path)
+    return {
+        key: DataSaver.load_arrow(os.path.join(path, f"{i}.arrow"))
+        for i, key in enumerate(keys)
+    }
+
+
+def artifact_bytes(value):
+    """In-memory size of a frame or dict of frames; other values count as 0."""
+    if isinstance(value, pd.DataFrame):
+        return memory_bytes(value)
+    if is_frame_dict(value):
+        return sum(memory_bytes(frame) for frame in value.values())
+    return 0
+
+
+class ArtifactStore:
+    """Hands stage outputs to later stages in memory.
+
+    Frames and dicts of frames are kept as they are until the frames held exceed
+    `memory_budget` bytes, when the oldest ones are spilled to uncompressed Arrow
+    files in `spill_dir` and read back as memory-mapped views on `get`. `put` with
+    `persist=True` also writes a frame's Arrow file and keeps it after `close`.
+    """
+
+    def __init__(self, spill_dir=None, memory_budget=None):
+        self.spill_dir = spill_dir
+        self.memory_budget = memory_budget
+        self.lock = threading.RLock()
+        self.values = {}  # in memory, oldest first
+        self.sizes = {}
+        self.spilled = {}  # name -> (path, keys of a frame dict or None)
+        self.persisted = set()
+
+    def __contains__(self, name):
+        return name in self.values or name in self.spilled
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def memory_used(self):
+        with self.lock:
+            return sum(self.sizes.values())
+
+    def path(self, name):
+        return os.path.join(self.spill_dir, f"{name}.arrow")
+
+    def put(self, name, value, persist=False):
+        with self.lock:
+            self.release(name)
+            self.values[name] = value
+            self.sizes[name] = artifact_bytes(value)
+            if persist:
+                if not isinstance(value, pd.DataFrame) and not is_frame_dict(value):
+                    raise ValueError(f"Only frames can be persisted, not {name}")
+                self.write(name)
+                self.persisted.add(name)
+            self.enforce_budget(keep=name)
+
+    def get(self, name):
+        with self.lock:
+            if name in self.values:
+                return self.values[name]
+            path, keys = self.spilled[name]
+        return read_frames(path, keys)
+
+    def write(self, name):
+        """Write an in-memory artifact to its Arrow file, once."""
+        if name in self.spilled:
+            return
+        if self.spill_dir is None:
+            raise ValueError(f"Cannot write artifact {name}: no spill_dir is set")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self.path(name)
+        self.spilled[name] = (path, write_frames(self.values[name], path))
+
+    def enforce_budget(self, keep=None):
+        """Spill the oldest frames to disk until the rest fit the budget."""
+        if self.memory_budget is None:
+            return
+        for name in list(self.values):
+            if self.memory_used() <= self.memory_budget:
+                return
+            if name == keep or not self.sizes[name]:
+                continue
+            self.write(name)
+            logging.info(f"Spilled artifact {name} ({self.sizes[name]} bytes)")
+            del self.values[name]
+            del self.sizes[name]
+
+    def release(self, name):
+        """Drop an artifact no later stage needs, removing its unpersisted file."""
+        with self.lock:
+            self.values.pop(name, None)
+            self.sizes.pop(name, None)
+            spilled = self.spilled.pop(name, None)
+            if spilled is not None and name not in self.persisted:
+                remove_path(spilled[0])
+            self.persisted.discard(name)
+
+    def close(self):
+        """Release every artifact, keeping the persisted files."""
+        with self.lock:
+            for name in self.persisted:
+                self.spilled.pop(name, None)
+            self.persisted.clear()
+            for name in list(self.values) + list(self.spilled):
+                self.release(name)
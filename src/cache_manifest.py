@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# Trailing magic bytes written by each binary format, checked without a full read
+FOOTER_MAGIC = {
+    ".parquet": b"PAR1",
+    ".feather": b"ARROW1",
+}
+
+
+class CacheManifest:
+    """JSON index of cached files with size, access time, fetch time and content hash."""
+
+    FILE_NAME = "cache_manifest.json"
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.path = os.path.join(cache_dir, self.FILE_NAME)
+        self._lock = threading.RLock()
+        self.entries = self._load()
+
+    @classmethod
+    def for_dir(cls, cache_dir, max_bytes=None):
+        """Return the manifest shared by every cache living in `cache_dir`."""
+        key = os.path.abspath(cache_dir)
+        with cls._instances_lock:
+            manifest = cls._instances.get(key)
+            if manifest is None:
+                manifest = cls._instances[key] = cls(cache_dir, max_bytes)
+            elif max_bytes is not None:
+                manifest.max_bytes = max_bytes
+            return manifest
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable cache manifest {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def _key(self, path):
+        return os.path.relpath(path, self.cache_dir)
+
+    @staticmethod
+    def file_hash(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def record(self, path):
+        """Register a freshly written file, then enforce the disk budget."""
+        now = time.time()
+        with self._lock:
+            self.entries[self._key(path)] = {
+                "bytes": os.path.getsize(path),
+                "sha256": self.file_hash(path),
+                "fetched_at": now,
+                "last_access": now,
+            }
+            self.evict(keep=[path])
+            self._save()
+
+    def touch(self, path):
+        """Mark a file as used; files written before the manifest existed are adopted."""
+        with self._lock:
+            entry = self.entries.get(self._key(path))
+            if entry is None:
+                self.record(path)
+                return
+            entry["last_access"] = time.time()
+            self._save()
+
+    def remove(self, path):
+        """Forget a file and delete it from disk if it still exists."""
+        with self._lock:
+            self.entries.pop(self._key(path), None)
+            if os.path.exists(path):
+                os.remove(path)
+            self._save()
+
+    def is_valid(self, path):
+        """Cheaply detect truncated or corrupt files from their size and footer."""
+        entry = self.entries.get(self._key(path))
+        if not os.path.exists(path):
+            return False
+        size = os.path.getsize(path)
+        if entry is not None and entry["bytes"] != size:
+            logging.warning(
+                f"Cache file {path} is {size} bytes, expected {entry['bytes']}"
+            )
+            return False
+        magic = FOOTER_MAGIC.get(os.path.splitext(path)[1])
+        if magic is not None:
+            with open(path, "rb") as f:
+                f.seek(max(0, size - len(magic)))
+                if f.read() != magic:
+                    logging.warning(f"Cache file {path} has a corrupt footer")
+                    return False
+        return True
+
+    def verify(self, path):
+        """Fully re-hash a file and compare it with the recorded content hash."""
+        entry = self.entries.get(self._key(path))
+        return (
+            entry is not None
+            and self.is_valid(path)
+            and self.file_hash(path) == entry["sha256"]
+        )
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self.entries.values())
+
+    def evict(self, keep=()):
+        """Delete least recently used files until the cache fits in max_bytes."""
+        if self.max_bytes is None:
+            return []
+        keep = {self._key(path) for path in keep}
+        evicted = []
+        with self._lock:
+            by_access = sorted(
+                self.entries.items(), key=lambda item: item[1]["last_access"]
+            )
+            for key, entry in by_access:
+                if self.total_bytes() <= self.max_bytes:
+                    break
+                if key in keep:
+                    continue
+                path = os.path.join(self.cache_dir, key)
+                if os.path.exists(path):
+                    os.remove(path)
+                del self.entries[key]
+                evicted.append(key)
+                logging.info(f"Evicted {key} ({entry['bytes']} bytes) from the cache")
+            self._save()
+        return evicted
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Fields stored as unsigned integers when every value is a whole, non-negative number
+COUNT_FIELDS = ("Volume",)
+
+
+def split_columns(columns):
+    """Split `Field_TICKER` column names into (fields, tickers)."""
+    fields, tickers = [], []
+    for column in columns:
+        if "_" not in column:
+            raise ValueError(f"Column {column!r} is not named Field_TICKER")
+        field, ticker = column.split("_", 1)
+        fields.append(field)
+        tickers.append(ticker)
+    return fields, tickers
+
+
+def compact_dtype(field, values, float32_prices=False):
+    """Storage dtype of a long-format field under the dtype policy.
+
+    Counts become the smallest nullable unsigned integer that holds them, and
+    other fields become float32 with `float32_prices`.
+    """
+    if field in COUNT_FIELDS:
+        observed = values[~np.isnan(values)]
+        if (observed >= 0).all() and (observed == np.floor(observed)).all():
+            largest = observed.max() if len(observed) else 0
+            return "UInt32" if largest < 2**32 else "UInt64"
+        return values.dtype
+    return np.float32 if float32_prices else values.dtype
+
+
+def to_long(data, float32_prices=False, downcast=True):
+    """Stack a wide `Field_TICKER` frame into one row per ticker and date.
+
+    The result has the date column, a categorical `ticker` column and one column
+    per field, ticker by ticker in date order. Each field is moved with a single
+    scatter into a (ticker x date) block, and rows without any value are dropped.
+    """
+    date = data.index.name or "Date"
+    fields, tickers = split_columns(data.columns)
+    field_names = list(dict.fromkeys(fields))
+    ticker_names = list(dict.fromkeys(tickers))
+    field_codes = np.array([field_names.index(field) for field in fields], dtype=int)
+    ticker_codes = np.array([ticker_names.index(t) for t in tickers], dtype=int)
+    rows = len(data)
+
+    blocks = {}
+    keep = np.zeros(len(ticker_names) * rows, dtype=bool)
+    for code, field in enumerate(field_names):
+        columns = np.flatnonzero(field_codes == code)
+        block = np.full((len(ticker_names), rows), np.nan)
+        block[ticker_codes[columns]] = data.iloc[:, columns].to_numpy(dtype=float).T
+        blocks[field] = block.ravel()
+        keep |= ~np.isnan(blocks[field])
+
+    long_data = {
+        date: data.index.take(np.tile(np.arange(rows), len(ticker_names))[keep]),
+        "ticker": pd.Categorical.from_codes(
+            np.repeat(np.arange(len(ticker_names)), rows)[keep], ticker_names
+        ),
+    }
+    for field, values in blocks.items():
+        values = values[keep]
+        if downcast:
+            dtype = compact_dtype(field, values, float32_prices)
+            values = pd.Series(values).astype(dtype).array
+        long_data[field] = values
+    return pd.DataFrame(long_data)
+
+
+def to_wide(long_data):
+    """Unstack a `to_long` frame back into the wide `Field_TICKER` layout.
+
+    Columns come out ticker by ticker, each ticker with the fields it has values
+    for, so a frame round-trips to its original layout.
+    """
+    date = long_data.columns[0]
+    fields = [c for c in long_data.columns if c not in (date, "ticker")]
+    ticker = long_data["ticker"]
+    if not isinstance(ticker.dtype, pd.CategoricalDtype):
+        ticker = ticker.astype(pd.CategoricalDtype(list(dict.fromkeys(ticker))))
+    ticker_codes = ticker.cat.codes.to_numpy()
+    ticker_names = list(ticker.cat.categories)
+    dates = pd.Index(long_data[date])
+    index = dates.unique().sort_values()
+    positions = index.get_indexer(dates)
+
+    blocks = {}
+    for field in fields:
+        values = long_data[field]
+        dtype = values.dtype if values.dtype.kind == "f" else np.float64
+        block = np.full((len(ticker_names), len(index)), np.nan, dtype=dtype)
+        block[ticker_codes, positions] = values.to_numpy(dtype=dtype, na_value=np.nan)
+        blocks[field] = block
+
+    columns = {}
+    for code, name in enumerate(ticker_names):
+        for field, block in blocks.items():
+            if not np.isnan(block[code]).all():
+                columns[f"{field}_{name}"] = block[code]
+    return pd.DataFrame(columns, index=index.rename(date))
+
+
+def memory_bytes(data):
+    """In-memory size of a frame, including its index and categoricals."""
+    return int(data.memory_usage(index=True, deep=True).sum())
@@ -7,19 +7,37 @@ import toml
 from dotenv import load_dotenv
 
 from acquisition import FredAcquisition, YahooAcquisition
-from merging import DataMerger
-from saving import DataSaver
+from artifacts import ArtifactStore
+from gap_fill import GapMask
+from merging import DEFAULT_MERGE_MEMORY_BUDGET, DataMerger
+from pipeline import Stage, StageCache, StageGraph, log_plan
+from rate_limiter import FRED_REQUESTS_PER_MINUTE
+from replay import build_sources
+from saving import DEFAULT_FORMATS, DataSaver
 
 # Load environment variables from .env
 load_dotenv()
 
+# Output formats holding merged_data in its wide layout, cheapest to read first;
+# incremental merges read their stored state back from one of them
+STATE_FORMATS = ("arrow", "parquet", "csv")
+
 
 class Orchestrator:
     def __init__(self, config_path):
         self.config = self.load_config(config_path)
         self.fred_api_key = os.getenv("FRED_API_KEY")
-        if not self.fred_api_key:
+        replaying = self.config.get("replay", {}).get("mode") == "replay"
+        if not self.fred_api_key and not replaying:
             raise EnvironmentError("FRED_API_KEY not set in environment variables.")
+        merge_mode = self.config["settings"].get("merge_mode", "full")
+        if merge_mode == "incremental" and not set(STATE_FORMATS) & set(
+            self.output_formats()
+        ):
+            raise ValueError(
+                'merge_mode = "incremental" reads the stored merge back and needs '
+                f"one of {list(STATE_FORMATS)} in output.formats"
+            )
 
     @staticmethod
     def load_config(config_path):
@@ -53,59 +71,302 @@ class Orchestrator:
         return start_date, end_date
 
     def run(self):
-        """Run the entire data pipeline."""
+        """Run the entire data pipeline as a DAG of stages, returning the plan.
+
+        Stages are skipped when their config and inputs are unchanged since the
+        last run, and the Yahoo and FRED stages run side by side with
+        settings.concurrent_stages. Frames pass between stages in memory and are
+        spilled to Arrow files under <output_dir>/artifacts only beyond
+        settings.artifact_memory_budget or when listed in settings.persist_artifacts.
+        """
         logging.basicConfig(
             level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
         )
+        downloader, fred_client = build_sources(
+            self.config.get("replay", {}), self.fred_api_key
+        )
+        settings = self.config["settings"]
+        cache = None
+        if settings.get("stage_cache", True):
+            cache = StageCache(
+                os.path.join(self.config["output"]["output_dir"], "stages")
+            )
+        max_workers = 2 if settings.get("concurrent_stages", False) else 1
+        store = ArtifactStore(
+            spill_dir=os.path.join(self.config["output"]["output_dir"], "artifacts"),
+            memory_budget=settings.get("artifact_memory_budget"),
+        )
+
+        try:
+            _, plan = StageGraph(self.build_stages(downloader, fred_client)).run(
+                cache, max_workers, store
+            )
+        finally:
+            store.close()
+        log_plan(plan)
+        return plan
+
+    def build_stages(self, downloader=None, fred_client=None):
+        """The pipeline stages: dates, then Yahoo and FRED, then the merge."""
+        output_dir = self.config["output"]["output_dir"]
+        formats = self.output_formats()
+        settings = self.config["settings"]
+        yahoo_config = self.config["sources"]["Yahoo_Finance"]
+        replay = self.config.get("replay", {})
+        fred_config = self.config["sources"]["FRED"]
+        persist = settings.get("persist_artifacts", [])
+
+        def settings_for(*keys):
+            # Only the settings a stage reads go into its fingerprint
+            return {key: settings[key] for key in keys if key in settings}
+
+        def output_paths(name):
+            sinks = DataSaver.open_sinks(output_dir, name, formats)
+            return [path for _, path in sinks.values()]
+
+        def dates():
+            start_date, end_date = self.validate_dates(
+                self.config["date_ranges"]["start_date"],
+                self.config["date_ranges"]["end_date"],
+            )
+            return {
+                "start_date": pd.Timestamp(start_date).strftime("%Y-%m-%d"),
+                "end_date": pd.Timestamp(end_date).strftime("%Y-%m-%d"),
+            }
+
+        stages = [
+            Stage(
+                "dates",
+                dates,
+                outputs=["start_date", "end_date"],
+                config=self.config["date_ranges"],
+            ),
+            Stage(
+                "yahoo",
+                lambda start_date, end_date: {
+                    "yahoo_data": self.run_yahoo_stage(start_date, end_date, downloader)
+                },
+                inputs=["start_date", "end_date"],
+                outputs=["yahoo_data"],
+                config=[
+                    yahoo_config,
+                    settings_for("cache_max_bytes"),
+                    formats,
+                    replay,
+                ],
+                targets=output_paths("yahoo_data"),
+                # Incremental refreshes exist to pick up new rows
+                cacheable=yahoo_config.get("refresh_mode", "full") != "incremental",
+            ),
+            Stage(
+                "fred",
+                lambda start_date, end_date: {
+                    "fred_data": self.run_fred_stage(start_date, end_date, fred_client)
+                },
+                inputs=["start_date", "end_date"],
+                outputs=["fred_data"],
+                config=[
+                    fred_config,
+                    settings_for("cache_max_bytes"),
+                    replay,
+                ],
+            ),
+            Stage(
+                "merge",
+                lambda yahoo_data, fred_data: self.run_merge_stage(
+                    yahoo_data, fred_data
+                ),
+                inputs=["yahoo_data", "fred_data"],
+                config=[
+                    fred_config.get("series_options"),
+                    settings_for(
+                        "alignment",
+                        "missing_data_handling",
+                        "merge_mode",
+                        "revision_window",
+                        "merge_memory_budget",
+                    ),
+                    formats,
+                ],
+                targets=output_paths("merged_data"),
+            ),
+        ]
+        for stage in stages:
+            stage.persist = [output for output in stage.outputs if output in persist]
+        return stages
+
+    def output_formats(self):
+        """Selected output formats, each mapped to its [output.<format>] options."""
+        output = self.config["output"]
+        formats = output.get("formats", DEFAULT_FORMATS)
+        return {fmt: output.get(fmt, {}) for fmt in formats}
+
+    def load_merged_state(self, yahoo_data, fred_data_dict):
+        """Load the FRED columns of the saved merged data if it can be extended.
+
+        The data is read back from the first of STATE_FORMATS in output.formats.
+        Returns None when there is no saved output or its columns no longer match
+        the configured tickers and series, in which case a full merge is needed.
+        """
+        formats = self.output_formats()
+        fmt = next(fmt for fmt in STATE_FORMATS if fmt in formats)
+        sink, path = DataSaver.open_sinks(
+            self.config["output"]["output_dir"], "merged_data", {fmt: formats[fmt]}
+        )[fmt]
+        if not os.path.exists(path):
+            return None
+        fred_columns = [f"Value_{series_name}" for series_name in fred_data_dict]
+        expected = list(yahoo_data.columns) + fred_columns
+        if sink.stored_columns(path) != expected:
+            logging.info("Saved merged data has different columns; merging in full")
+            return None
+        logging.info(f"Extending the merged data stored in {path}")
+        return sink.read(path, fred_columns)
+
+    def run_merge_stage(self, yahoo_data, fred_data_dict):
+        """Merge and save in the configured merge mode (full, incremental or streaming)."""
+        settings = self.config["settings"]
+        merge_options = {
+            "alignment": settings.get("alignment", "exact"),
+            "series_options": self.config["sources"]["FRED"].get("series_options"),
+            "missing_data_handling": settings["missing_data_handling"],
+        }
+        output_dir = self.config["output"]["output_dir"]
+        formats = self.output_formats()
+        sqlite = formats.get("sqlite")
+        if sqlite and sqlite.get("database"):
+            # The Yahoo stage already upserted yahoo_data into the shared store
+            formats["sqlite"] = {**sqlite, "tables": ["fred_data"]}
+
+        merge_mode = settings.get("merge_mode", "full")
+        if merge_mode == "streaming":
+            logging.info("Calling DataMerger.merge_chunks to stream the merged data")
+            chunks = DataMerger.merge_chunks(
+                yahoo_data,
+                fred_data_dict,
+                settings.get("merge_memory_budget", DEFAULT_MERGE_MEMORY_BUDGET),
+                return_gap_mask=True,
+                **merge_options,
+            )
+            # The packed masks of the chunks are kept, 1/64th of the merged data
+            gap_masks = []
+
+            def merged_chunks():
+                for chunk, gap_mask in chunks:
+                    gap_masks.append(gap_mask)
+                    yield chunk
+
+            rows = DataSaver.save_chunks(
+                merged_chunks(), output_dir, name="merged_data", formats=formats
+            )
+            if rows:
+                DataSaver.save_gap_mask(
+                    GapMask.concat(gap_masks), output_dir, name="merged_data"
+                )
+            return
+
+        existing = None
+        if merge_mode == "incremental":
+            existing = self.load_merged_state(yahoo_data, fred_data_dict)
+
+        if existing is not None and not existing.empty:
+            logging.info("Calling DataMerger.merge_incremental to extend merged data")
+            merged_tail, gap_mask = DataMerger.merge_incremental(
+                existing,
+                yahoo_data,
+                fred_data_dict,
+                revision_window=settings.get("revision_window", 5),
+                return_gap_mask=True,
+                **merge_options,
+            )
+            DataSaver.validate_and_save(
+                merged_tail,
+                output_dir,
+                name="merged_data",
+                append=True,
+                formats=formats,
+            )
+            DataSaver.append_gap_mask(
+                gap_mask,
+                output_dir,
+                "merged_data",
+                kept_rows=int(existing.index.searchsorted(merged_tail.index[0])),
+                stored_rows=len(existing),
+            )
+            return
+
+        # Merge Datasets
+        logging.info("Calling DataMerger.merge_datasets to align Yahoo and FRED data")
+        merged_data, gap_mask = DataMerger.merge_datasets(
+            yahoo_data, fred_data_dict, return_gap_mask=True, **merge_options
+        )
+        logging.debug(f"Merged data preview: {merged_data.head()}")
 
-        # Validate date ranges
-        start_date = self.config["date_ranges"]["start_date"]
-        end_date = self.config["date_ranges"]["end_date"]
-        start_date, end_date = self.validate_dates(start_date, end_date)
+        # Save Merged Data
+        DataSaver.validate_and_save(
+            merged_data, output_dir, name="merged_data", formats=formats
+        )
+        DataSaver.save_gap_mask(gap_mask, output_dir, name="merged_data")
 
-        # Yahoo Finance Acquisition
+    def run_yahoo_stage(self, start_date, end_date, downloader=None):
+        """Fetch and save the Yahoo Finance data, returning the frame in memory."""
         yahoo_config = self.config["sources"]["Yahoo_Finance"]
         yahoo = YahooAcquisition(
             tickers=yahoo_config["tickers"],
             start_date=start_date,
             end_date=end_date,
             output_dir=self.config["output"]["output_dir"],
+            max_workers=yahoo_config.get("max_workers", 1),
+            retries=yahoo_config.get("retries", 3),
+            batch_size=yahoo_config.get("batch_size", 1),
+            cache_dir=yahoo_config.get("cache_dir"),
+            cache_ttl=yahoo_config.get("cache_ttl"),
+            downloader=downloader,
+            cache_max_bytes=self.config["settings"].get("cache_max_bytes"),
+            # settings.missing_data_handling is for FRED; Yahoo keeps its own default
+            missing_data_handling=yahoo_config.get(
+                "missing_data_handling", "forward_fill"
+            ),
+            output_formats=self.output_formats(),
         )
-        yahoo_data = yahoo.fetch_data()
+        if yahoo_config.get("refresh_mode", "full") == "incremental":
+            yahoo_data = yahoo.fetch_incremental(
+                overlap_days=yahoo_config.get("overlap_days", 5)
+            )
+        else:
+            yahoo_data = yahoo.fetch_data()
         logging.debug(f"Yahoo data after fetching: {yahoo_data.head()}")
         yahoo.save_data(yahoo_data)
+        if yahoo.gap_mask is not None:
+            DataSaver.save_gap_mask(
+                yahoo.gap_mask, self.config["output"]["output_dir"], name="yahoo_data"
+            )
+
+        # The frame is handed on in memory rather than re-read from its export.
+        # Normalize Yahoo data's index to ensure no timezone issues
+        yahoo_data.index = yahoo_data.index.normalize()
+        return yahoo_data
 
-        # FRED Acquisition
+    def run_fred_stage(self, start_date, end_date, fred_client=None):
+        """Fetch every configured FRED series."""
         fred_config = self.config["sources"]["FRED"]
         fred = FredAcquisition(
             api_key=self.fred_api_key,
             cache_dir=self.config["output"]["output_dir"],
-            missing_data_handling=self.config["settings"]["missing_data_handling"],
+            fred_client=fred_client,
+            max_workers=fred_config.get("max_workers", 1),
+            requests_per_minute=fred_config.get(
+                "requests_per_minute", FRED_REQUESTS_PER_MINUTE
+            ),
+            cache_format=fred_config.get("cache_format", "feather"),
+            cache_max_bytes=self.config["settings"].get("cache_max_bytes"),
         )
         fred_data_dict = fred.fetch_all_series(
             fred_config["series_ids"], start_date, end_date
         )
         for series_name, fred_data in fred_data_dict.items():
             logging.debug(f"FRED data preview for {series_name}: {fred_data.head()}")
-
-        # Load saved Yahoo Finance data
-        yahoo_data_path = os.path.join(
-            self.config["output"]["output_dir"], "yahoo_data.csv"
-        )
-        yahoo_data = pd.read_csv(yahoo_data_path, index_col=0, parse_dates=True)
-
-        # Normalize Yahoo data's index to ensure no timezone issues
-        yahoo_data.index = yahoo_data.index.normalize()
-
-        # Merge Datasets
-        logging.info("Calling DataMerger.merge_datasets to align Yahoo and FRED data")
-        merged_data = DataMerger.merge_datasets(yahoo_data, fred_data_dict)
-        logging.debug(f"Merged data preview: {merged_data.head()}")
-
-        # Save Merged Data
-        DataSaver.validate_and_save(
-            merged_data, self.config["output"]["output_dir"], name="merged_data"
-        )
+        return fred_data_dict
 
 
 if __name__ == "__main__":
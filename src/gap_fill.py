@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+# Supported values of settings.missing_data_handling
+POLICIES = ("interpolate", "forward_fill", "flag")
+
+# Scratch memory of one fill pass when the caller sets no budget
+DEFAULT_FILL_MEMORY_BUDGET = 8 * 1024 * 1024
+
+# Upper bound on the scratch bytes a fill pass holds per cell, reached when
+# every cell of the pass is a gap
+FILL_BYTES_PER_CELL = 96
+
+
+class GapMask:
+    """Bit-packed boolean mask of the cells that were missing before gap filling.
+
+    Rows are packed eight to a byte per column, so the mask of a float block takes
+    1/64th of its memory. Cells filled by interpolate or forward_fill are set, as
+    are the cells a flag policy leaves missing.
+    """
+
+    def __init__(self, bits, rows, columns):
+        self.bits = bits
+        self.rows = rows
+        self.columns = list(columns)
+
+    @classmethod
+    def empty(cls, rows, columns):
+        """Mask with room for `rows` rows of `columns` and no cell set."""
+        return cls(np.zeros(((rows + 7) // 8, len(columns)), np.uint8), rows, columns)
+
+    def unpack(self):
+        """Boolean (rows x columns) array of the mask."""
+        return np.unpackbits(self.bits, axis=0, count=self.rows).astype(bool)
+
+    def column(self, name):
+        """Boolean mask of one column, unpacking only that column."""
+        j = self.columns.index(name)
+        return np.unpackbits(self.bits[:, j], count=self.rows).astype(bool)
+
+    def to_frame(self, index):
+        """Boolean DataFrame of the mask over `index`."""
+        return pd.DataFrame(self.unpack(), index=index, columns=self.columns)
+
+    def count(self):
+        """Number of masked cells per column."""
+        counts = np.unpackbits(self.bits, axis=0, count=self.rows).sum(axis=0)
+        return dict(zip(self.columns, counts.tolist()))
+
+    def head(self, rows):
+        """Mask of the first `rows` rows."""
+        return GapMask(self.bits[: (rows + 7) // 8], rows, self.columns)
+
+    @classmethod
+    def concat(cls, masks):
+        """Mask of the rows of `masks` one after another, which share their columns.
+
+        Packed bytes are copied as they are while the rows stay aligned to whole
+        bytes; only masks that start mid-byte are unpacked to be shifted.
+        """
+        masks = list(masks)
+        columns = masks[0].columns
+        pieces, rows = [], 0
+        carry = np.zeros((0, len(columns)), dtype=bool)  # rows of a partial byte
+        for mask in masks:
+            if mask.columns != columns:
+                raise ValueError("Cannot concatenate gap masks with different columns")
+            if len(carry):
+                unpacked = np.concatenate([carry, mask.unpack()])
+                whole = len(unpacked) // 8 * 8
+                pieces.append(np.packbits(unpacked[:whole], axis=0))
+                carry = unpacked[whole:]
+            else:
+                whole = mask.rows // 8
+                pieces.append(mask.bits[:whole])
+                carry = np.unpackbits(
+                    mask.bits[whole:], axis=0, count=mask.rows - 8 * whole
+                ).astype(bool)
+            rows += mask.rows
+        pieces.append(np.packbits(carry, axis=0))
+        return cls(np.concatenate(pieces), rows, columns)
+
+    def save(self, path):
+        """Write the packed mask to an .npz file."""
+        np.savez(
+            path, bits=self.bits, rows=self.rows, columns=np.array(self.columns)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["bits"], int(saved["rows"]), saved["columns"].tolist())
+
+
+def check_policy(policy):
+    if policy not in POLICIES:
+        raise ValueError(f"Unsupported missing_data_handling: {policy}")
+    return policy
+
+
+def fill_gaps(
+    block, policies, columns=None, seed=None, ahead=None, memory_budget=None
+):
+    """Fill the NaN gaps of a 2-D float block in place, returning a GapMask.
+
+    `policies` names one policy per column (or one for all of them). Leading gaps
+    take the first observation and trailing gaps the last one under both
+    interpolate and forward_fill, matching `ffill().bfill()`.
+
+    `seed` maps column names to the value just before the block and `ahead` to a
+    (row offset, value) pair for the first observation after it, so a block can
+    be filled as one piece of a longer history. A seeded column is filled from
+    the seed instead of being back-filled.
+
+    Columns are filled in passes whose scratch buffers, allocated once and reused
+    by every pass, stay within `memory_budget` bytes.
+    """
+    rows, width = block.shape
+    columns = list(range(width)) if columns is None else list(columns)
+    if isinstance(policies, str):
+        policies = [policies] * width
+    codes = np.array([POLICIES.index(check_policy(p)) for p in policies], dtype=int)
+    seed = seed or {}
+    ahead = ahead or {}
+    seed_values = np.array([seed.get(c, np.nan) for c in columns], dtype=float)
+    ahead_rows = np.array([ahead.get(c, (rows, np.nan))[0] for c in columns], float)
+    ahead_values = np.array([ahead.get(c, (rows, np.nan))[1] for c in columns], float)
+
+    mask = GapMask.empty(rows, columns)
+    if rows == 0 or width == 0:
+        return mask
+
+    if memory_budget is None:
+        memory_budget = DEFAULT_FILL_MEMORY_BUDGET
+    step = min(width, max(1, int(memory_budget) // (FILL_BYTES_PER_CELL * rows)))
+    positions = np.arange(rows)[:, None]
+    missing_buffer = np.empty((rows, step), dtype=bool)
+    before_buffer = np.empty((rows, step), dtype=np.intp)
+    after_buffer = np.empty((rows, step), dtype=np.intp)
+    for start in range(0, width, step):
+        stop = min(start + step, width)
+        part = block[:, start:stop]  # a view, so filling it fills the block
+        missing = np.isnan(part, out=missing_buffer[:, : stop - start])
+        mask.bits[:, start:stop] = np.packbits(missing, axis=0)
+        fill_columns = codes[start:stop] != POLICIES.index("flag")
+        if not (missing.any(axis=0) & fill_columns).any():
+            continue
+
+        # Row of the last observation at or before, and the first at or after,
+        # each cell; -1 and `rows` stand for the seed and the value ahead
+        before = before_buffer[:, : stop - start]
+        before[...] = positions
+        before[missing] = -1
+        np.maximum.accumulate(before, axis=0, out=before)
+        after = after_buffer[:, : stop - start]
+        after[...] = positions
+        after[missing] = rows
+        np.minimum.accumulate(after[::-1], axis=0, out=after[::-1])
+
+        # Everything from here on is sized by the gaps, not by the pass
+        missing &= fill_columns[None, :]
+        gap_rows, gap_cols = np.nonzero(missing)
+        before = before[gap_rows, gap_cols]
+        after = after[gap_rows, gap_cols]
+        cols = gap_cols + start
+        previous = np.where(
+            before >= 0, part[before.clip(min=0), gap_cols], seed_values[cols]
+        )
+        has_following = after < rows
+        following = np.where(
+            has_following, part[after.clip(max=rows - 1), gap_cols], ahead_values[cols]
+        )
+        after = np.where(has_following, after, ahead_rows[cols])
+
+        values = np.where(np.isnan(previous), following, previous)
+        between = codes[cols] == POLICIES.index("interpolate")
+        between &= ~np.isnan(previous) & ~np.isnan(following)
+        weight = (gap_rows[between] - before[between]) / (
+            after[between] - before[between]
+        )
+        values[between] = previous[between] + (
+            following[between] - previous[between]
+        ) * weight
+        part[gap_rows, gap_cols] = values
+    return mask
+
+
+def fill_frame(data, policies, memory_budget=None):
+    """Fill the gaps of the float columns of `data`, returning a GapMask.
+
+    `policies` is one policy for every column or a mapping from column name to
+    policy; columns without an entry are left as they are. The columns are filled
+    in a copy that is assigned back, so frames sharing their storage, including
+    read-only memory-mapped ones, are left untouched.
+    """
+    if isinstance(policies, str):
+        policies = dict.fromkeys(data.columns, policies)
+    columns = [
+        column
+        for column in data.columns
+        if column in policies and pd.api.types.is_float_dtype(data[column])
+    ]
+    if not columns:
+        return GapMask.empty(len(data), columns)
+    block = data[columns].to_numpy(dtype=float, copy=True)
+    mask = fill_gaps(
+        block,
+        [policies[column] for column in columns],
+        columns,
+        memory_budget=memory_budget,
+    )
+    data[columns] = block
+    return mask
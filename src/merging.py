@@ -1,73 +1,458 @@
 import logging
 
+import numpy as np
 import pandas as pd
 
+from compact import memory_bytes
+from gap_fill import fill_gaps
+
+# How long an observation stays usable in as-of alignment, by series frequency
+DEFAULT_STALENESS = {
+    "D": "7D",
+    "W": "14D",
+    "M": "45D",
+    "Q": "120D",
+    "A": "400D",
+}
+
+# Working-set cap for the streaming merge when settings.merge_memory_budget is unset
+DEFAULT_MERGE_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Copies of a chunk alive at once while it is merged and written: the aligned
+# block, the fill scratch, the merged frame and its serialized forms
+CHUNK_COPIES = 6
+
+
+class MergeBuilder:
+    """Fills aligned series into one preallocated float block over a fixed index."""
+
+    def __init__(self, index, capacity):
+        self.index = index
+        self.block = np.full((len(index), capacity), np.nan)
+        self.columns = []
+        self.gap_mask = None
+
+    def add(self, name, values):
+        """Copy one aligned series into the next free column of the block."""
+        self.block[:, len(self.columns)] = values
+        self.columns.append(name)
+
+    def fill(
+        self, policies="forward_fill", seed=None, ahead=None, memory_budget=None
+    ):
+        """Fill the gaps of every column in place with `gap_fill.fill_gaps`.
+
+        `seed` maps column names to the value preceding the block; a seeded column
+        is filled from it instead of being back-filled. `ahead` maps column names
+        to the (row offset, value) of the next observation after the block.
+        `memory_budget` bounds the scratch memory of the fill in bytes.
+        """
+        self.gap_mask = fill_gaps(
+            self.block[:, : len(self.columns)],
+            policies,
+            self.columns,
+            seed,
+            ahead,
+            memory_budget,
+        )
+
+    def build(self):
+        """Wrap the filled block in a DataFrame without copying it."""
+        return pd.DataFrame(
+            self.block[:, : len(self.columns)],
+            index=self.index,
+            columns=self.columns,
+            copy=False,
+        )
+
 
 class DataMerger:
     @staticmethod
+    def align_series(index, fred_data, series_name):
+        """Align one FRED series to `index` by exact date, returning (values, matches, misses)."""
+        values = fred_data["Value"]
+        if not values.index.is_monotonic_increasing:
+            # A stable sort keeps the first of any duplicated dates in front
+            values = values.sort_index(kind="stable")
+        fred_keys = values.index.to_numpy(dtype="datetime64[ns]")
+        keys = index.to_numpy(dtype="datetime64[ns]")
+
+        # Binary search instead of a hash lookup, so no index engine is built per series
+        positions = np.searchsorted(fred_keys, keys, side="left")
+        matched = positions < len(fred_keys)
+        matched[matched] = fred_keys[positions[matched]] == keys[matched]
+        aligned = np.full(len(keys), np.nan)
+        aligned[matched] = values.to_numpy(dtype=float)[positions[matched]]
+
+        matches = int(matched.sum())
+        aligned = pd.Series(aligned, index=index, name=f"Value_{series_name}")
+        return aligned, matches, len(index) - matches
+
     @staticmethod
-    def merge_datasets(yahoo_data, fred_data_dict):
-        """Align FRED data to the Yahoo Finance timeline and merge with Yahoo data."""
-        logging.info(
-            "Starting brute-force alignment of FRED data to Yahoo Finance timeline"
+    def prepare_series(fred_data_dict):
+        """Normalize FRED indexes and drop series that lack a Value column."""
+        prepared = {}
+        for series_name, fred_data in fred_data_dict.items():
+            logging.debug(f"Processing FRED series: {series_name}")
+
+            # Normalize FRED index and remove timezone information
+            fred_index = fred_data.index
+            if not isinstance(fred_index, pd.DatetimeIndex):
+                fred_index = pd.to_datetime(fred_index)
+            if fred_index.tz is not None or not fred_index.is_normalized:
+                fred_data.index = fred_index.normalize().tz_localize(None)
+            logging.debug(
+                f"Normalized FRED index for {series_name}: {fred_data.index[:5]}"
+            )
+
+            if "Value" not in fred_data.columns:
+                logging.error(
+                    f"Column 'Value' not found in FRED data for {series_name}. Available columns: {fred_data.columns}"
+                )
+                continue
+            prepared[series_name] = fred_data
+        return prepared
+
+    @staticmethod
+    def align_asof(index, fred_data_dict, series_options=None):
+        """Align every series to `index` as of each date, in one batched search.
+
+        Each observation becomes usable `release_lag` after its date and is carried
+        forward for at most `max_staleness` (defaulting from the series frequency).
+        Nothing is back-filled, so no value is visible before its release.
+        """
+        series_options = series_options or {}
+        names = list(fred_data_dict)
+        builder = MergeBuilder(index, len(names))
+        builder.columns = [f"Value_{name}" for name in names]
+        if not names or len(index) == 0:
+            return builder
+
+        codes, times, values, staleness = [], [], [], []
+        for code, name in enumerate(names):
+            options = series_options.get(name, {})
+            frequency = options.get("frequency", "D")
+            if frequency not in DEFAULT_STALENESS:
+                raise ValueError(f"Unknown frequency {frequency!r} for series {name}")
+            release_lag = pd.Timedelta(options.get("release_lag", "0D"))
+            max_staleness = pd.Timedelta(
+                options.get("max_staleness", DEFAULT_STALENESS[frequency])
+            )
+
+            series = fred_data_dict[name]["Value"]
+            if not series.index.is_monotonic_increasing:
+                series = series.sort_index(kind="stable")
+            # Only observations usable on some date of `index` are searched, so a
+            # chunk of a streaming merge only touches its own stretch of history
+            first = index.min() - release_lag - max_staleness
+            series = series.loc[first : index.max() - release_lag].dropna()
+            available = (series.index + release_lag).to_numpy(dtype="datetime64[s]")
+            codes.append(np.full(len(series), code))
+            times.append(available.astype(np.int64))
+            values.append(series.to_numpy(dtype=float))
+            staleness.append(int(max_staleness.total_seconds()))
+
+        codes = np.concatenate(codes)
+        times = np.concatenate(times)
+        values = np.concatenate(values)
+        staleness = np.asarray(staleness)
+        dates = index.to_numpy(dtype="datetime64[s]").astype(np.int64)
+        if len(times) == 0:
+            return builder
+
+        # Key every observation by (series, release time) so one sorted array
+        # serves all series, then search it for every (date, series) pair at once.
+        # Series are concatenated in code order and each one is sorted, so the
+        # keys are already in order.
+        origin = min(times.min(), dates.min())
+        span = max(times.max(), dates.max()) - origin + 1
+        keys = codes * span + (times - origin)
+
+        # Dates are searched in row chunks so the (date x series) temporaries
+        # stay around a million cells regardless of the history length
+        series_codes = np.arange(len(names))
+        matches = np.zeros(len(names), dtype=np.int64)
+        chunk_rows = max(1, (1 << 20) // len(names))
+        for start in range(0, len(dates), chunk_rows):
+            chunk = dates[start : start + chunk_rows]
+            queries = series_codes[None, :] * span + (chunk - origin)[:, None]
+            positions = np.searchsorted(keys, queries, side="right") - 1
+            valid = positions >= 0
+            positions[~valid] = 0
+            valid &= codes[positions] == series_codes[None, :]
+            valid &= chunk[:, None] - times[positions] <= staleness[None, :]
+            builder.block[start : start + chunk_rows] = np.where(
+                valid, values[positions], np.nan
+            )
+            matches += valid.sum(axis=0)
+
+        for name, count in zip(names, matches):
+            logging.info(f"{name}: {count} matches, {len(index) - count} misses")
+        return builder
+
+    @staticmethod
+    def series_policies(
+        names, missing_data_handling="forward_fill", series_options=None
+    ):
+        """Gap-fill policy of each series, from series_options or the default."""
+        series_options = series_options or {}
+        return [
+            series_options.get(name, {}).get(
+                "missing_data_handling", missing_data_handling
+            )
+            for name in names
+        ]
+
+    @staticmethod
+    def align(
+        index,
+        fred_data_dict,
+        alignment="exact",
+        series_options=None,
+        seed=None,
+        missing_data_handling="forward_fill",
+        ahead=None,
+        memory_budget=None,
+    ):
+        """Align prepared FRED series to `index`, returning a filled MergeBuilder.
+
+        Exact alignment fills the gaps with each series' `missing_data_handling`
+        policy, using at most `memory_budget` bytes of scratch memory. As-of
+        alignment never fills, so its gaps are only masked.
+        """
+        if alignment == "asof":
+            builder = DataMerger.align_asof(index, fred_data_dict, series_options)
+            builder.fill("flag")
+            return builder
+        if alignment != "exact":
+            raise ValueError(f"Unknown alignment mode: {alignment}")
+
+        # All aligned series go into one block that is attached once at the end
+        builder = MergeBuilder(index, len(fred_data_dict))
+        for series_name, fred_data in fred_data_dict.items():
+            # Look up every Yahoo date in the FRED index at once
+            aligned, matches, misses = DataMerger.align_series(
+                index, fred_data, series_name
+            )
+            logging.info(f"{series_name}: {matches} matches, {misses} misses")
+            builder.add(aligned.name, aligned.to_numpy())
+
+        policies = DataMerger.series_policies(
+            fred_data_dict, missing_data_handling, series_options
         )
+        builder.fill(policies, seed, ahead, memory_budget)
+        return builder
+
+    @staticmethod
+    def merge_datasets(
+        yahoo_data,
+        fred_data_dict,
+        alignment="exact",
+        series_options=None,
+        missing_data_handling="forward_fill",
+        return_gap_mask=False,
+    ):
+        """Align FRED data to the Yahoo Finance timeline and merge with Yahoo data.
+
+        `alignment="exact"` copies values on matching dates and fills the gaps;
+        `alignment="asof"` uses `align_asof` with per-series `series_options`.
+        With `return_gap_mask` a (merged_data, GapMask) pair is returned, the mask
+        marking the FRED cells that had no observation.
+        """
+        logging.info(f"Starting {alignment} alignment of FRED data to Yahoo timeline")
 
         # Ensure Yahoo data index is timezone-naive
         yahoo_data.index = yahoo_data.index.tz_localize(None)
         logging.debug(
             f"Yahoo data index after tz normalization: {yahoo_data.index[:5]}"
         )
+        fred_data_dict = DataMerger.prepare_series(fred_data_dict)
+        builder = DataMerger.align(
+            yahoo_data.index,
+            fred_data_dict,
+            alignment,
+            series_options,
+            missing_data_handling=missing_data_handling,
+        )
+        merged_data = pd.concat([yahoo_data, builder.build()], axis=1)
 
-        # Initialize a copy of Yahoo data to retain all merged data
-        merged_data = yahoo_data.copy()
+        logging.info(f"Final merged dataset shape: {merged_data.shape}")
+        logging.debug(f"Final merged dataset preview: {merged_data.head()}")
+        if return_gap_mask:
+            return merged_data, builder.gap_mask
+        return merged_data
 
-        for series_name, fred_data in fred_data_dict.items():
-            logging.debug(f"Processing FRED series: {series_name}")
+    @staticmethod
+    def merge_incremental(
+        existing,
+        yahoo_data,
+        fred_data_dict,
+        revision_window=5,
+        alignment="exact",
+        series_options=None,
+        missing_data_handling="forward_fill",
+        return_gap_mask=False,
+    ):
+        """Merge only the rows after the last `revision_window` existing rows.
 
-            # Normalize FRED index and remove timezone information
-            fred_data.index = (
-                pd.to_datetime(fred_data.index).normalize().tz_localize(None)
-            )
-            logging.debug(
-                f"Normalized FRED index for {series_name}: {fred_data.index[:5]}"
+        `existing` needs the previously merged index and its FRED columns. The
+        returned frame starts at the first re-aligned date and is meant to replace
+        everything from that date on in the stored output. With `return_gap_mask`
+        the GapMask of the returned rows comes with it.
+        """
+        yahoo_data.index = yahoo_data.index.tz_localize(None)
+        if existing.empty:
+            return DataMerger.merge_datasets(
+                yahoo_data,
+                fred_data_dict,
+                alignment,
+                series_options,
+                missing_data_handling,
+                return_gap_mask,
             )
 
-            # Create an aligned DataFrame for this series
-            aligned_data = pd.DataFrame(index=yahoo_data.index)
-            matches, misses = 0, 0
-
-            # Brute-force alignment: Find each Yahoo date in FRED and copy the value
-            for date in yahoo_data.index:
-                if date in fred_data.index:
-                    if "Value" in fred_data.columns:
-                        aligned_data.loc[date, f"Value_{series_name}"] = fred_data.loc[
-                            date, "Value"
-                        ]
-                        matches += 1
-                        logging.debug(
-                            f"Matched date {date} (Yahoo) with {date} (FRED) for {series_name}, value: {fred_data.loc[date, 'Value']}"
-                        )
-                    else:
-                        logging.error(
-                            f"Column 'Value' not found in FRED data for {series_name}. Available columns: {fred_data.columns}"
-                        )
-                        break
-                else:
-                    aligned_data.loc[date, f"Value_{series_name}"] = None
-                    misses += 1
+        # Re-align a trailing window of stored rows to pick up data revisions
+        cutoff = existing.index[-min(revision_window, len(existing))]
+        tail = yahoo_data[yahoo_data.index >= cutoff]
+        logging.info(
+            f"Merging {len(tail)} rows from {cutoff} onto {len(existing)} stored rows"
+        )
 
-            logging.info(f"{series_name}: {matches} matches, {misses} misses")
+        # Gaps at the start of the tail continue from the last kept stored row
+        kept = existing[existing.index < cutoff]
+        seed = kept.iloc[-1].to_dict() if len(kept) else None
 
-            # Forward-fill and backward-fill missing values
-            aligned_data.ffill(inplace=True)
-            aligned_data.bfill(inplace=True)
-            logging.debug(
-                f"Final aligned data for {series_name}: {aligned_data.head()}"
+        fred_data_dict = DataMerger.prepare_series(fred_data_dict)
+        builder = DataMerger.align(
+            tail.index,
+            fred_data_dict,
+            alignment,
+            series_options,
+            seed,
+            missing_data_handling,
+        )
+        merged_tail = pd.concat([tail, builder.build()], axis=1)
+        logging.info(f"Incremental merge produced {merged_tail.shape} rows")
+        if return_gap_mask:
+            return merged_tail, builder.gap_mask
+        return merged_tail
+
+    @staticmethod
+    def next_observations(index, fred_data_dict, stop):
+        """Row and value of each series' first exactly aligned value from row `stop`.
+
+        Each FRED index is searched from the date of row `stop` of the sorted
+        `index`, so nothing the size of the history is built. Returns a mapping
+        from column name to (row, value) for the series that have one.
+        """
+        if stop >= len(index):
+            return {}
+        keys = index.to_numpy(dtype="datetime64[ns]")
+        found = {}
+        for series_name, fred_data in fred_data_dict.items():
+            fred_keys = fred_data.index.to_numpy(dtype="datetime64[ns]")
+            values = fred_data["Value"].to_numpy(dtype=float)
+            j = np.searchsorted(fred_keys, keys[stop], side="left")
+            step = 16
+            while j < len(fred_keys):
+                window = slice(j, j + step)
+                rows = np.searchsorted(keys, fred_keys[window], side="left")
+                hit = rows < len(keys)
+                hit[hit] = keys[rows[hit]] == fred_keys[window][hit]
+                hit &= ~np.isnan(values[window])
+                # Like align_series, only the first of duplicated dates counts
+                first = np.ones(len(rows), dtype=bool)
+                first[1:] = fred_keys[window][1:] != fred_keys[window][:-1]
+                if j > 0:
+                    first[0] = fred_keys[j] != fred_keys[j - 1]
+                hit &= first
+                if hit.any():
+                    k = np.argmax(hit)
+                    found[f"Value_{series_name}"] = (int(rows[k]), values[j + k])
+                    break
+                j += step
+                step *= 2
+        return found
+
+    @staticmethod
+    def row_bytes(yahoo_data, fred_data_dict):
+        """Bytes of one merged row: its Yahoo and FRED values and the index."""
+        return 8 * (yahoo_data.shape[1] + len(fred_data_dict) + 1)
+
+    @staticmethod
+    def chunk_rows(yahoo_data, fred_data_dict, memory_budget):
+        """Rows per chunk keeping one chunk's copies within the budget.
+
+        The budget bounds the merge's working set: a chunk, its intermediate
+        copies and the fill scratch. The input frames stay resident outside it.
+        Raises ValueError when the budget cannot hold a single row.
+        """
+        row_bytes = DataMerger.row_bytes(yahoo_data, fred_data_dict)
+        rows = int(memory_budget) // (CHUNK_COPIES * row_bytes)
+        if rows < 1:
+            raise ValueError(
+                f"merge_memory_budget of {memory_budget} bytes cannot hold one "
+                f"merged row; it needs at least {CHUNK_COPIES * row_bytes} bytes"
             )
+        return rows
 
-            # Concatenate the aligned data into the merged dataset
-            merged_data = pd.concat([merged_data, aligned_data], axis=1)
+    @staticmethod
+    def merge_chunks(
+        yahoo_data,
+        fred_data_dict,
+        memory_budget,
+        alignment="exact",
+        series_options=None,
+        missing_data_handling="forward_fill",
+        return_gap_mask=False,
+    ):
+        """Yield the merged dataset in date chunks sized to `memory_budget` bytes.
 
-            logging.info(f"Final merged dataset shape: {merged_data.shape}")
-            logging.debug(f"Final merged dataset preview: {merged_data.head()}")
-        return merged_data
+        Concatenating the chunks gives the same frame as `merge_datasets`, but only
+        one chunk of the merged output is alive at a time. Exact alignment carries
+        each chunk's last row into the next one and looks up the next observation
+        after the chunk, so gaps spanning a chunk boundary fill as in one piece.
+        With `return_gap_mask` every chunk is yielded with its GapMask.
+        """
+        yahoo_data.index = yahoo_data.index.tz_localize(None)
+        fred_data_dict = DataMerger.prepare_series(fred_data_dict)
+        for series_name, fred_data in fred_data_dict.items():
+            # Sorted once here rather than again for every chunk
+            if not fred_data.index.is_monotonic_increasing:
+                fred_data_dict[series_name] = fred_data.sort_index(kind="stable")
+        rows = DataMerger.chunk_rows(yahoo_data, fred_data_dict, memory_budget)
+        row_bytes = DataMerger.row_bytes(yahoo_data, fred_data_dict)
+        resident = memory_bytes(yahoo_data) + sum(
+            memory_bytes(fred_data) for fred_data in fred_data_dict.values()
+        )
+        logging.info(
+            f"Streaming {alignment} merge of {len(yahoo_data)} rows in chunks of "
+            f"{rows}; the inputs hold another {resident} bytes outside the budget"
+        )
+
+        seed = None
+        for start in range(0, len(yahoo_data), rows):
+            chunk = yahoo_data.iloc[start : start + rows]
+            ahead = {}
+            if alignment == "exact":
+                ahead = {
+                    column: (row - start, value)
+                    for column, (row, value) in DataMerger.next_observations(
+                        yahoo_data.index, fred_data_dict, start + len(chunk)
+                    ).items()
+                }
+            builder = DataMerger.align(
+                chunk.index,
+                fred_data_dict,
+                alignment,
+                series_options,
+                seed,
+                missing_data_handling,
+                ahead,
+                # The fill scratch gets the share of one copy of the chunk
+                rows * row_bytes,
+            )
+            merged_chunk = pd.concat([chunk, builder.build()], axis=1)
+            if alignment == "exact":
+                seed = dict(zip(builder.columns, builder.block[-1]))
+            yield (merged_chunk, builder.gap_mask) if return_gap_mask else merged_chunk
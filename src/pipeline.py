@@ -0,0 +1,289 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from artifacts import ArtifactStore, is_frame_dict, read_frames, write_frames
+from saving import DataSaver
+
+
+class Stage:
+    """A pipeline step with declared inputs and outputs.
+
+    `run` is called with the named inputs as keyword arguments and returns a dict
+    holding each of `outputs`. `config` is the part of the configuration the stage
+    reads and is fingerprinted with its inputs. `targets` are files the stage
+    writes, which must still exist for a cached result to be reused, and stages
+    with `cacheable=False` always run. Outputs listed in `persist` are also
+    written to the artifact store's spill directory and kept there.
+    """
+
+    def __init__(
+        self,
+        name,
+        run,
+        inputs=(),
+        outputs=(),
+        config=None,
+        targets=(),
+        cacheable=True,
+        persist=(),
+    ):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config = config
+        self.targets = list(targets)
+        self.cacheable = cacheable
+        self.persist = list(persist)
+
+
+def digest_json(value):
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def value_fingerprint(value):
+    """Content fingerprint of a stage output."""
+    if isinstance(value, pd.DataFrame):
+        return DataSaver.content_hash(value)
+    if is_frame_dict(value):
+        return digest_json(
+            {key: DataSaver.content_hash(frame) for key, frame in value.items()}
+        )
+    return digest_json(value)
+
+
+def stage_fingerprint(stage, input_fingerprints):
+    """Fingerprint of a stage run from its config and the content of its inputs."""
+    return digest_json(
+        {"stage": stage.name, "config": stage.config, "inputs": input_fingerprints}
+    )
+
+
+class StageCache:
+    """Persisted stage outputs with the fingerprints they were computed for.
+
+    Frames are stored as Arrow IPC files and loaded back as memory-mapped views,
+    dicts of frames as a directory of them, and other values as JSON. The
+    `stages.json` manifest only names outputs once they are completely written.
+    """
+
+    FILE_NAME = "stages.json"
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, self.FILE_NAME)
+        self.lock = threading.Lock()
+        self.entries = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def output_path(self, stage_name, output, kind):
+        extension = {"frame": ".arrow", "frames": "", "json": ".json"}[kind]
+        return os.path.join(self.cache_dir, f"{stage_name}.{output}{extension}")
+
+    def lookup(self, stage, fingerprint):
+        """The cache entry of `stage` if it holds a run with `fingerprint`."""
+        with self.lock:
+            entry = self.entries.get(stage.name)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        paths = [
+            self.output_path(stage.name, output, kind)
+            for output, kind in entry["kinds"].items()
+        ]
+        if not all(os.path.exists(path) for path in paths + stage.targets):
+            return None
+        return entry
+
+    def load(self, stage, entry):
+        outputs = {}
+        for output, kind in entry["kinds"].items():
+            path = self.output_path(stage.name, output, kind)
+            if kind in ("frame", "frames"):
+                outputs[output] = read_frames(path, entry["keys"].get(output))
+            else:
+                with open(path) as f:
+                    outputs[output] = json.load(f)
+        return outputs
+
+    def store(self, stage, fingerprint, outputs, output_fingerprints):
+        with self.lock:
+            # Forget the old run before its files are overwritten
+            if self.entries.pop(stage.name, None) is not None:
+                self.save_manifest()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        kinds, keys = {}, {}
+        for output, value in outputs.items():
+            if isinstance(value, pd.DataFrame) or is_frame_dict(value):
+                kinds[output] = "frame" if isinstance(value, pd.DataFrame) else "frames"
+                path = self.output_path(stage.name, output, kinds[output])
+                frame_keys = write_frames(value, path)
+                if frame_keys is not None:
+                    keys[output] = frame_keys
+            else:
+                kinds[output] = "json"
+                path = self.output_path(stage.name, output, "json")
+                DataSaver.write_atomic(
+                    path, lambda temp_path: self.write_json(value, temp_path)
+                )
+        with self.lock:
+            self.entries[stage.name] = {
+                "fingerprint": fingerprint,
+                "kinds": kinds,
+                "keys": keys,
+                "outputs": output_fingerprints,
+            }
+            self.save_manifest()
+
+    @staticmethod
+    def write_json(value, path):
+        with open(path, "w") as f:
+            json.dump(value, f)
+
+
+class StageGraph:
+    """A DAG of stages, each depending on the stages producing its inputs."""
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output {output!r} is produced by two stages")
+                self.producers[output] = stage.name
+        self.dependencies = {}
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.producers]
+            if missing:
+                raise ValueError(f"No stage produces {missing}, needed by {stage.name}")
+            self.dependencies[stage.name] = {
+                self.producers[name] for name in stage.inputs
+            }
+        self.order = self.topological_order()
+
+    def topological_order(self):
+        order, done = [], set()
+        pending = dict(self.dependencies)
+        while pending:
+            ready = [name for name, needs in pending.items() if needs <= done]
+            if not ready:
+                raise ValueError(f"Stage graph has a cycle through {sorted(pending)}")
+            for name in ready:
+                del pending[name]
+            order.extend(ready)
+            done.update(ready)
+        return order
+
+    def run(self, cache=None, max_workers=1, store=None):
+        """Run every stage once its inputs are ready, skipping unchanged ones.
+
+        Stages whose dependencies are met run concurrently on up to `max_workers`
+        threads. A stage is cached when `cache` holds a run with the same
+        fingerprint, in which case its stored outputs are loaded instead.
+
+        Outputs are handed from stage to stage in memory through `store`, an
+        ArtifactStore, and released once every stage that takes them has run.
+        Returns the store, holding the outputs no stage takes, and the plan: one
+        entry per stage in topological order with its status ("cached" or
+        "executed").
+        """
+        store = ArtifactStore() if store is None else store
+        consumers = {output: set() for output in self.producers}
+        for stage in self.stages.values():
+            for output in stage.inputs:
+                consumers[output].add(stage.name)
+
+        fingerprints, plan = {}, {}
+        pending = {name: self.dependencies[name] for name in self.order}
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for name in [n for n, needs in pending.items() if needs <= set(plan)]:
+                    del pending[name]
+                    stage = self.stages[name]
+                    inputs = {output: store.get(output) for output in stage.inputs}
+                    input_fingerprints = {
+                        output: fingerprints[output] for output in stage.inputs
+                    }
+                    future = executor.submit(
+                        self.run_stage, stage, inputs, input_fingerprints, cache
+                    )
+                    running[future] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    stage = self.stages[name]
+                    outputs, output_fingerprints, plan[name] = future.result()
+                    for output, value in outputs.items():
+                        store.put(output, value, persist=output in stage.persist)
+                    fingerprints.update(output_fingerprints)
+                    for output in stage.inputs:
+                        consumers[output].discard(name)
+                        if not consumers[output]:
+                            store.release(output)
+        return store, [plan[name] for name in self.order]
+
+    @staticmethod
+    def run_stage(stage, inputs, input_fingerprints, cache):
+        start = time.perf_counter()
+        fingerprint = stage_fingerprint(stage, input_fingerprints)
+        entry = None
+        if cache is not None and stage.cacheable:
+            entry = cache.lookup(stage, fingerprint)
+        if entry is not None:
+            outputs = cache.load(stage, entry)
+            output_fingerprints = entry["outputs"]
+            status = "cached"
+        else:
+            outputs = stage.run(**inputs) or {}
+            if sorted(outputs) != sorted(stage.outputs):
+                raise ValueError(
+                    f"Stage {stage.name} returned {sorted(outputs)}, "
+                    f"expected {sorted(stage.outputs)}"
+                )
+            output_fingerprints = {
+                output: value_fingerprint(value) for output, value in outputs.items()
+            }
+            if cache is not None and stage.cacheable:
+                cache.store(stage, fingerprint, outputs, output_fingerprints)
+            status = "executed"
+        return (
+            outputs,
+            output_fingerprints,
+            {
+                "stage": stage.name,
+                "status": status,
+                "fingerprint": fingerprint,
+                "seconds": time.perf_counter() - start,
+            },
+        )
+
+
+def log_plan(plan):
+    logging.info("Stage plan:")
+    for entry in plan:
+        logging.info(
+            f"  {entry['stage']:8s} {entry['status']:8s} "
+            f"{entry['fingerprint'][:12]} {entry['seconds']:.3f}s"
+        )
@@ -0,0 +1,41 @@
+import logging
+import threading
+import time
+
+# FRED allows 120 requests per minute per API key
+FRED_REQUESTS_PER_MINUTE = 120
+
+
+class TokenBucket:
+    """Thread-safe token bucket that blocks callers until a request may be sent."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate  # tokens added per second
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, capacity=None):
+        """Build a bucket from a requests-per-minute limit."""
+        return cls(requests_per_minute / 60.0, capacity=capacity)
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Take tokens from the bucket, sleeping until enough have accumulated."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            logging.debug(f"Rate limit reached, waiting {wait:.2f}s")
+            self.sleep(wait)
@@ -0,0 +1,187 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class FixtureStore:
+    """Fixture files holding recorded Yahoo and FRED responses, one Parquet per symbol."""
+
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = fixtures_dir
+        self._lock = threading.Lock()
+
+    def _path(self, source, symbol):
+        safe_symbol = re.sub(r"[^A-Za-z0-9.-]", "_", symbol)
+        return os.path.join(self.fixtures_dir, source, f"{safe_symbol}.parquet")
+
+    def load(self, source, symbol):
+        """Load a recorded frame, or None if the symbol was never recorded."""
+        path = self._path(source, symbol)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def save(self, source, symbol, frame):
+        """Record a frame, merging it with any previously recorded range."""
+        path = self._path(source, symbol)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            existing = self.load(source, symbol)
+            if existing is not None:
+                merged = frame.combine_first(existing)[frame.columns]
+                frame = merged.astype(
+                    {c: t for c, t in frame.dtypes.items() if not merged[c].hasnans}
+                )
+            frame.to_parquet(path, index=True)
+        logging.info(f"Recorded {source} fixture for {symbol} to {path}")
+
+
+def _slice(frame, start=None, end=None, inclusive_end=True):
+    """Slice a frame by date, matching the timezone of its index."""
+    mask = np.ones(len(frame), dtype=bool)
+    tz = frame.index.tz
+    if start is not None:
+        start = pd.Timestamp(start)
+        start = start.tz_localize(tz) if start.tz is None and tz else start
+        mask &= frame.index >= start
+    if end is not None:
+        end = pd.Timestamp(end)
+        end = end.tz_localize(tz) if end.tz is None and tz else end
+        mask &= frame.index <= end if inclusive_end else frame.index < end
+    return frame[mask]
+
+
+class ReplayYFData:
+    """In-process stand-in for vbt.YFData built from recorded frames."""
+
+    def __init__(self, data):
+        self.data = data
+        self.symbols = list(data)
+
+    def get(self, column=None):
+        """Mirror vbt.Data.get for one or many symbols."""
+        if len(self.symbols) == 1:
+            frame = self.data[self.symbols[0]]
+            return frame if column is None else frame[column]
+        columns = column if isinstance(column, list) else [column]
+        frames = tuple(
+            pd.DataFrame({symbol: self.data[symbol][c] for symbol in self.symbols})
+            for c in columns
+        )
+        return frames if isinstance(column, list) else frames[0]
+
+
+class ReplaySource:
+    """Injects latency and failures into replayed requests deterministically."""
+
+    def __init__(self, store, latency=0.0, failure_rate=0.0, fail_symbols=(), seed=0):
+        self.store = store
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_symbols = set(fail_symbols)
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate_request(self, symbols):
+        """Sleep for the configured latency and raise an injected failure if drawn."""
+        with self._lock:
+            self.requests += 1
+            draw = self._random.random()
+        if self.latency:
+            time.sleep(self.latency)
+        failed = self.fail_symbols.intersection(symbols)
+        if failed:
+            raise ConnectionError(f"Injected failure for {sorted(failed)}")
+        if draw < self.failure_rate:
+            raise ConnectionError(f"Injected random failure for {symbols}")
+
+
+class ReplayDownloader(ReplaySource):
+    """Replays recorded Yahoo responses with the vbt.YFData.download signature."""
+
+    def __call__(self, symbols, start=None, end=None, **kwargs):
+        symbols = symbols if isinstance(symbols, list) else [symbols]
+        self._simulate_request(symbols)
+        data = {}
+        for symbol in symbols:
+            frame = self.store.load("yahoo", symbol)
+            if frame is None:
+                raise KeyError(f"No recorded Yahoo fixture for {symbol}")
+            data[symbol] = _slice(frame, start, end, inclusive_end=False)
+        return ReplayYFData(data)
+
+
+class ReplayFred(ReplaySource):
+    """Replays recorded FRED series with the fredapi.Fred.get_series signature."""
+
+    def get_series(self, series_id, observation_start=None, observation_end=None):
+        self._simulate_request([series_id])
+        frame = self.store.load("fred", series_id)
+        if frame is None:
+            raise KeyError(f"No recorded FRED fixture for {series_id}")
+        return _slice(frame, observation_start, observation_end)["Value"]
+
+
+class RecordingDownloader:
+    """Wraps vbt.YFData.download and records every response to the fixture store."""
+
+    def __init__(self, store, downloader=None):
+        self.store = store
+        self.downloader = downloader
+
+    def __call__(self, symbols, start=None, end=None, **kwargs):
+        import vectorbt as vbt
+
+        downloader = self.downloader or vbt.YFData.download
+        yf_data = downloader(symbols, start=start, end=end, **kwargs)
+        if yf_data is not None:
+            for symbol in yf_data.symbols:
+                self.store.save("yahoo", symbol, yf_data.data[symbol])
+        return yf_data
+
+
+class RecordingFred:
+    """Wraps a fredapi.Fred client and records every series to the fixture store."""
+
+    def __init__(self, store, fred):
+        self.store = store
+        self.fred = fred
+
+    def get_series(self, series_id, observation_start=None, observation_end=None):
+        series = self.fred.get_series(
+            series_id,
+            observation_start=observation_start,
+            observation_end=observation_end,
+        )
+        if not series.empty:
+            self.store.save("fred", series_id, series.rename("Value").to_frame())
+        return series
+
+
+def build_sources(replay_config, api_key=None):
+    """Build the (downloader, fred_client) pair for a `[replay]` config section."""
+    mode = replay_config.get("mode", "off")
+    if mode == "off":
+        return None, None
+
+    store = FixtureStore(replay_config["fixtures_dir"])
+    if mode == "record":
+        from fredapi import Fred
+
+        return RecordingDownloader(store), RecordingFred(store, Fred(api_key=api_key))
+    if mode == "replay":
+        options = {
+            "latency": replay_config.get("latency", 0.0),
+            "failure_rate": replay_config.get("failure_rate", 0.0),
+            "fail_symbols": replay_config.get("fail_symbols", []),
+            "seed": replay_config.get("seed", 0),
+        }
+        return ReplayDownloader(store, **options), ReplayFred(store, **options)
+    raise ValueError(f"Unknown replay mode: {mode}")
@@ -1,38 +1,967 @@
+import hashlib
+import json
 import logging
 import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+import sqlite_store
+from compact import to_long
+from gap_fill import GapMask
+
+# Output formats written when the config does not list any
+DEFAULT_FORMATS = ("csv", "parquet")
+
+# Cells pandas formats per batch when a chunk is written as CSV; the formatted
+# text takes about 200 bytes per cell as Python strings
+CSV_BATCH_CELLS = 1 << 12
+
+
+class CsvSink:
+    """Writes a frame to `<name>.csv`."""
+
+    extension = "csv"
+
+    def write(self, data, path):
+        data.to_csv(path, index=True)
+
+    def write_chunk(self, chunk, path, first):
+        chunk.to_csv(
+            path,
+            mode="w" if first else "a",
+            header=first,
+            index=True,
+            chunksize=max(1, CSV_BATCH_CELLS // max(1, chunk.shape[1])),
+        )
+
+    def append(self, data, path, since):
+        DataSaver.append_csv(data, path, since)
+
+    def stored_columns(self, path):
+        return list(pd.read_csv(path, nrows=0).columns[1:])
+
+    def read(self, path, columns):
+        index_column = pd.read_csv(path, nrows=0).columns[0]
+        return pd.read_csv(
+            path, index_col=0, parse_dates=True, usecols=[index_column, *columns]
+        )
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    """Writes a frame to `<name>.parquet`, one row group per chunk when streaming."""
+
+    extension = "parquet"
+
+    def __init__(self):
+        self.writer = None
+
+    def prepare(self, data):
+        """The frame as stored; subclasses change the layout here."""
+        return data
+
+    def write(self, data, path):
+        self.prepare(data).to_parquet(path, index=True)
+
+    def write_chunk(self, chunk, path, first):
+        table = pa.Table.from_pandas(self.prepare(chunk), preserve_index=True)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(path, table.schema)
+        else:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+
+    def append(self, data, path, since):
+        DataSaver.append_parquet(self.prepare(data), path, since)
+
+    def stored_columns(self, path):
+        schema = pq.read_schema(path)
+        index_columns = schema.pandas_metadata["index_columns"]
+        return [name for name in schema.names if name not in index_columns]
+
+    def read(self, path, columns):
+        return pd.read_parquet(path, columns=columns)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class CompactParquetSink(ParquetSink):
+    """Writes the long, dtype-compacted layout of `compact.to_long` to Parquet.
+
+    Tickers are dictionary-encoded categoricals, volumes unsigned integers and,
+    with `float32_prices`, prices float32. `compact.to_wide` restores the layout.
+    """
+
+    extension = "compact.parquet"
+
+    def __init__(self, float32_prices=False):
+        super().__init__()
+        self.float32_prices = float32_prices
+
+    def prepare(self, data):
+        long_data = to_long(data, float32_prices=self.float32_prices)
+        # Indexed by date so appends can cut the stored rows at a date
+        return long_data.set_index(long_data.columns[0])
+
+
+class ArrowSink:
+    """Writes an uncompressed Arrow IPC (Feather v2) file to `<name>.arrow`.
+
+    Numeric columns are written from their NumPy buffers with NaN kept as a value
+    rather than a null, so `DataSaver.load_arrow` can map them without copying.
+    """
+
+    extension = "arrow"
+
+    def __init__(self):
+        self.writer = None
+        self.schema = None
+
+    @staticmethod
+    def to_table(data):
+        index_name = data.index.name or "Date"
+        arrays = [pa.array(data.index)]
+        for column in data.columns:
+            values = data[column]
+            if isinstance(values.dtype, np.dtype) and values.dtype.kind in "fiub":
+                arrays.append(pa.array(values.to_numpy()))
+            else:
+                arrays.append(pa.array(values))
+        names = [index_name] + [str(column) for column in data.columns]
+        return pa.Table.from_arrays(
+            arrays, names=names, metadata={"index": index_name}
+        )
+
+    def write(self, data, path):
+        feather.write_feather(self.to_table(data), path, compression="uncompressed")
+
+    def write_chunk(self, chunk, path, first):
+        table = self.to_table(chunk)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pa.ipc.new_file(path, self.schema)
+        else:
+            table = table.cast(self.schema)
+        self.writer.write_table(table)
+
+    def append(self, data, path, since):
+        existing = feather.read_table(path, memory_map=True)
+        tail = self.to_table(data)
+        if tail.schema.names != existing.schema.names:
+            raise ValueError(f"Columns of {path} differ from the appended data")
+        index_column = existing.schema.names[0]
+        cutoff = scalar_for(since, existing.schema.field(index_column).type)
+        kept = existing.filter(pc.less(existing[index_column], cutoff))
+        table = pa.concat_tables([kept, tail.cast(existing.schema)])
+        DataSaver.write_atomic(
+            path,
+            lambda temp_path: feather.write_feather(
+                table, temp_path, compression="uncompressed"
+            ),
+        )
+
+    def stored_columns(self, path):
+        schema = feather.read_table(path, memory_map=True).schema
+        index_column = (schema.metadata or {}).get(b"index", b"").decode()
+        index_column = index_column or schema.names[0]
+        return [name for name in schema.names if name != index_column]
+
+    def read(self, path, columns):
+        return DataSaver.load_arrow(path, columns=columns)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class PartitionedParquetSink:
+    """Writes a long-format, hive-partitioned Parquet dataset to `<name>.dataset/`.
+
+    Rows are laid out as by `compact.to_long`, and files are split into
+    `year=`/`ticker=` directories as listed in `partition_by`.
+    """
+
+    extension = "dataset"
+
+    def __init__(
+        self,
+        partition_by=("year", "ticker"),
+        row_group_size=65536,
+        compression="zstd",
+    ):
+        unknown = [column for column in partition_by if column not in PARTITION_TYPES]
+        if unknown:
+            raise ValueError(f"Unsupported partition columns: {unknown}")
+        self.partition_by = list(partition_by)
+        self.row_group_size = row_group_size
+        self.file_options = ds.ParquetFileFormat().make_write_options(
+            compression=compression, use_dictionary=True
+        )
+        self.chunks = 0
+
+    @staticmethod
+    def partitioning(partition_by):
+        return ds.partitioning(
+            pa.schema([(column, PARTITION_TYPES[column]) for column in partition_by]),
+            flavor="hive",
+        )
+
+    def to_long(self, data):
+        """The `compact.to_long` rows of `data` with their partition columns."""
+        long_data = to_long(data, downcast=False)
+        long_data["ticker"] = long_data["ticker"].astype(str)
+        if "year" in self.partition_by:
+            long_data["year"] = long_data.iloc[:, 0].dt.year.astype("int32")
+        return pa.Table.from_pandas(long_data, preserve_index=False)
+
+    def write_table(self, table, path, basename):
+        ds.write_dataset(
+            table,
+            path,
+            format="parquet",
+            partitioning=self.partitioning(self.partition_by),
+            file_options=self.file_options,
+            max_rows_per_group=self.row_group_size,
+            basename_template=f"{basename}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def write(self, data, path):
+        shutil.rmtree(path, ignore_errors=True)
+        self.write_table(self.to_long(data), path, "part")
+
+    def write_chunk(self, chunk, path, first):
+        if first:
+            shutil.rmtree(path, ignore_errors=True)
+        self.write_table(self.to_long(chunk), path, f"chunk{self.chunks}")
+        self.chunks += 1
+
+    def append(self, data, path, since):
+        """Rewrite the partitions holding dates from `since` on, keeping older rows.
+
+        The result is staged in a temp directory, where untouched fragments are
+        hard links to the current files, and swapped in once it is complete.
+        """
+        dataset = ds.dataset(
+            path, format="parquet", partitioning=self.partitioning(self.partition_by)
+        )
+        since = pd.Timestamp(since)
+        affected = None
+        if "year" in self.partition_by:
+            affected = ds.field("year") >= since.year
+        date = dataset.schema.names[0]
+        before = ds.field(date) < scalar_for(since, dataset.schema.field(date).type)
+        kept = dataset.to_table(
+            filter=before if affected is None else affected & before
+        )
+        tail = self.to_long(data)
+        if sorted(tail.schema.names) != sorted(kept.schema.names):
+            raise ValueError(f"Columns of {path} differ from the appended data")
+
+        replaced = {
+            os.path.normpath(fragment.path)
+            for fragment in dataset.get_fragments(filter=affected)
+        }
+        tail = tail.select(kept.schema.names).cast(kept.schema)
+
+        def write(temp_path):
+            for root, _, file_names in os.walk(path):
+                for file_name in file_names:
+                    source = os.path.normpath(os.path.join(root, file_name))
+                    if source in replaced:
+                        continue
+                    target = os.path.join(temp_path, os.path.relpath(source, path))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.link(source, target)
+            os.makedirs(temp_path, exist_ok=True)
+            stamp = time.time_ns()
+            self.write_table(kept, temp_path, f"kept{stamp}")
+            self.write_table(tail, temp_path, f"append{stamp}")
+
+        DataSaver.write_atomic(path, write)
+
+    def close(self):
+        pass
+
+
+class SqliteSink:
+    """Upserts a frame into the `yahoo_data`/`fred_data` tables of a SQLite store.
+
+    The store is `<name>.db` unless `database` names a shared file such as
+    `aligned_data.db`, relative to the output directory. `tables` limits which
+    tables are written. Each save is one transaction, so the store is updated in
+    place rather than through a temp file, and rows of other tickers and dates
+    are kept.
+    """
+
+    extension = "db"
+    in_place = True
+
+    def __init__(
+        self, database=None, batch_rows=sqlite_store.DEFAULT_BATCH_ROWS, tables=None
+    ):
+        unknown = [t for t in tables or () if t not in sqlite_store.TABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unsupported SQLite tables: {unknown}")
+        self.database = database
+        self.batch_rows = batch_rows
+        self.tables = tables
+
+    def write(self, data, path):
+        sqlite_store.write_frame(
+            path, data, batch_rows=self.batch_rows, tables=self.tables
+        )
+
+    def write_chunk(self, chunk, path, first):
+        self.write(chunk, path)
+
+    def append(self, data, path, since):
+        sqlite_store.write_frame(
+            path, data, since=since, batch_rows=self.batch_rows, tables=self.tables
+        )
+
+    def close(self):
+        pass
+
+
+# Hive partition columns of the partitioned dataset and their types
+PARTITION_TYPES = {"year": pa.int32(), "ticker": pa.string()}
+
+# Output sinks by format name; register a class here to add a format
+SINKS = {
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+    "partitioned": PartitionedParquetSink,
+    "compact": CompactParquetSink,
+    "arrow": ArrowSink,
+    "sqlite": SqliteSink,
+}
+
+
+def scalar_for(timestamp, arrow_type):
+    """Arrow scalar of `timestamp` in the (possibly timezone-aware) `arrow_type`."""
+    timestamp = pd.Timestamp(timestamp)
+    tz = getattr(arrow_type, "tz", None)
+    if tz is not None and timestamp.tz is None:
+        timestamp = timestamp.tz_localize(tz)
+    elif tz is None and timestamp.tz is not None:
+        timestamp = timestamp.tz_localize(None)
+    return pa.scalar(timestamp, type=arrow_type)
+
+
+def output_size(path):
+    """Size in bytes of an output file, or of every file under an output directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def replace_path(temp_path, path):
+    """Move a finished temp output over `path`.
+
+    Files are swapped with one atomic rename. A directory cannot replace a
+    non-empty one, so the old directory is renamed aside first and then removed.
+    """
+    if not os.path.isdir(path):
+        os.replace(temp_path, path)
+        return
+    old_path = f"{path}.old"
+    remove_path(old_path)
+    os.rename(path, old_path)
+    os.rename(temp_path, path)
+    remove_path(old_path)
+
+
+def staging_path(sink, path):
+    """Where a sink writes before its output replaces `path`.
+
+    Sinks with `in_place` (transactional stores) write straight to `path`.
+    """
+    return path if getattr(sink, "in_place", False) else f"{path}.tmp"
+
+
+def row_hashes(data):
+    """Hash of every row of a frame, its index included."""
+    return pd.util.hash_pandas_object(data, index=True).to_numpy()
+
+
+def date_values(index):
+    """Nanosecond integers of a DatetimeIndex, or None for other indexes."""
+    if not isinstance(index, pd.DatetimeIndex):
+        return None
+    return index.as_unit("ns").asi8
+
+
+def update_hash(digest, data, header=True, hashes=None):
+    """Feed a frame into `digest`; rows are hashed independently of chunking.
+
+    `hashes` are the frame's `row_hashes` when they are already computed, or the
+    row hashes of a whole output whose layout is the layout of `data`.
+    """
+    if header:
+        layout = [data.index.name, list(data.columns), [str(t) for t in data.dtypes]]
+        digest.update(json.dumps(layout, default=str).encode())
+    digest.update((row_hashes(data) if hashes is None else hashes).tobytes())
+    return digest
 
 
 class DataSaver:
     @staticmethod
-    def save_data(data, output_dir, name="merged_data"):
-        """Save data to CSV and Parquet formats, cleaning up unnecessary columns."""
-        csv_path = os.path.join(output_dir, f"{name}.csv")
-        parquet_path = os.path.join(output_dir, f"{name}.parquet")
+    def content_hash(data):
+        """SHA-256 of a frame's layout, index and values."""
+        return update_hash(hashlib.sha256(), data).hexdigest()
+
+    @staticmethod
+    def sidecar_path(output_dir, name):
+        return os.path.join(output_dir, f"{name}.hash.json")
+
+    @staticmethod
+    def read_sidecar(output_dir, name):
+        """The stored {"hash", "formats"} sidecar of an output, or None."""
+        try:
+            with open(DataSaver.sidecar_path(output_dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def stored_hash(output_dir, name="merged_data"):
+        """Content hash of the saved output, for cheap freshness checks.
 
+        None when there is no sidecar or an append to the output did not finish.
+        """
+        sidecar = DataSaver.read_sidecar(output_dir, name)
+        return sidecar["hash"] if sidecar and not sidecar.get("dirty") else None
+
+    @staticmethod
+    def write_sidecar(output_dir, name, sidecar):
+        sidecar_path = DataSaver.sidecar_path(output_dir, name)
+        with open(f"{sidecar_path}.tmp", "w") as f:
+            json.dump(sidecar, f)
+        os.replace(f"{sidecar_path}.tmp", sidecar_path)
+
+    @staticmethod
+    def row_hashes_path(output_dir, name):
+        return os.path.join(output_dir, f"{name}.hash.npz")
+
+    @staticmethod
+    def write_row_hashes(output_dir, name, dates, hashes):
+        """Keep the row hashes of a saved output, so an append can rehash it.
+
+        Only outputs indexed by date can be appended to; for others any stale
+        file is removed.
+        """
+        path = DataSaver.row_hashes_path(output_dir, name)
+        if dates is None:
+            remove_path(path)
+            return
+
+        def write(temp_path):
+            with open(temp_path, "wb") as f:
+                np.savez(f, dates=dates, hashes=hashes)
+
+        DataSaver.write_atomic(path, write)
+
+    @staticmethod
+    def read_row_hashes(output_dir, name):
+        """The (dates, hashes) arrays of a saved output, or None."""
+        try:
+            with np.load(DataSaver.row_hashes_path(output_dir, name)) as saved:
+                return saved["dates"], saved["hashes"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def is_unchanged(output_dir, name, sinks, content_hash):
+        """Whether every selected output already holds data with `content_hash`."""
+        sidecar = DataSaver.read_sidecar(output_dir, name)
+        return (
+            sidecar is not None
+            and not sidecar.get("dirty")
+            and sidecar["hash"] == content_hash
+            and all(
+                fmt in sidecar["formats"] and os.path.exists(path)
+                for fmt, (_, path) in sinks.items()
+            )
+        )
+
+    @staticmethod
+    def write_atomic(path, write):
+        """Run `write(temp_path)` and move the result over `path` once complete."""
+        temp_path = f"{path}.tmp"
+        remove_path(temp_path)
+        try:
+            write(temp_path)
+        except Exception:
+            remove_path(temp_path)
+            raise
+        replace_path(temp_path, path)
+
+    @staticmethod
+    def open_sinks(output_dir, name, formats=None):
+        """Instantiate the sink of each selected format with its output path.
+
+        `formats` lists format names, or maps them to keyword options of the sink.
+        """
+        formats = DEFAULT_FORMATS if formats is None else formats
+        options = formats if isinstance(formats, dict) else {}
+        unknown = [fmt for fmt in formats if fmt not in SINKS]
+        if unknown:
+            raise ValueError(f"Unsupported output formats: {unknown}")
+        sinks = {}
+        for fmt in formats:
+            sink = SINKS[fmt](**options.get(fmt, {}))
+            # A shared file such as the SQLite database lives in output_dir too
+            file_name = getattr(sink, "database", None) or f"{name}.{sink.extension}"
+            sinks[fmt] = (sink, os.path.join(output_dir, file_name))
+        return sinks
+
+    @staticmethod
+    def run_sinks(sinks, action, max_workers=None):
+        """Run `action(sink, path)` for every sink concurrently and time each one.
+
+        Returns {format: {"path", "seconds", "bytes"}}, `bytes` being the size of
+        the file once written.
+        """
+
+        def timed(fmt):
+            sink, path = sinks[fmt]
+            start = time.perf_counter()
+            action(sink, path)
+            return {"path": path, "seconds": time.perf_counter() - start}
+
+        if len(sinks) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers or len(sinks)) as executor:
+                results = dict(zip(sinks, executor.map(timed, sinks)))
+        else:
+            results = {fmt: timed(fmt) for fmt in sinks}
+        for result in results.values():
+            result["bytes"] = output_size(result["path"])
+        return results
+
+    @staticmethod
+    def log_report(report, verb="Saved"):
+        for fmt, result in report.items():
+            logging.info(
+                f"{verb} {fmt} to {result['path']} in {result['seconds']:.3f}s "
+                f"({result['bytes']} bytes)"
+            )
+
+    @staticmethod
+    def save_data(
+        data, output_dir, name="merged_data", formats=None, max_workers=None
+    ):
+        """Save data in every selected format at once, cleaning up unnecessary columns.
+
+        Nothing is written when the content hash matches the stored sidecar;
+        otherwise each format is written to a temp file and renamed into place, or
+        for in-place sinks committed in one transaction. Returns the per-format
+        report of `run_sinks`, empty when skipped.
+        """
         try:
             # Drop unnecessary columns (e.g., 'Unnamed: 0')
             if "Unnamed: 0" in data.columns:
                 data = data.drop(columns=["Unnamed: 0"])
 
-            # Save to CSV
-            data.to_csv(csv_path, index=True)
-            logging.info(f"Saved data to {csv_path}")
+            sinks = DataSaver.open_sinks(output_dir, name, formats)
+            hashes = row_hashes(data)
+            content_hash = update_hash(hashlib.sha256(), data, hashes=hashes)
+            content_hash = content_hash.hexdigest()
+            if DataSaver.is_unchanged(output_dir, name, sinks, content_hash):
+                logging.info(f"{name} is unchanged ({content_hash[:12]}), not saving")
+                return {}
+
+            def write(sink, path):
+                if staging_path(sink, path) == path:
+                    sink.write(data, path)
+                else:
+                    DataSaver.write_atomic(
+                        path, lambda temp_path: sink.write(data, temp_path)
+                    )
 
-            # Save to Parquet
-            data.to_parquet(parquet_path, index=True)
-            logging.info(f"Saved data to {parquet_path}")
+            report = DataSaver.run_sinks(sinks, write, max_workers)
+            DataSaver.write_row_hashes(
+                output_dir, name, date_values(data.index), hashes
+            )
+            DataSaver.write_sidecar(
+                output_dir, name, {"hash": content_hash, "formats": list(sinks)}
+            )
         except Exception as e:
             logging.error(f"Failed to save data: {e}", exc_info=True)
             raise
+        DataSaver.log_report(report)
+        return report
 
     @staticmethod
-    def validate_and_save(data, output_dir, name="validated_data"):
-        """Validate for duplicate columns and save the data."""
+    def save_chunks(chunks, output_dir, name="merged_data", formats=None):
+        """Save an iterable of row chunks in each selected format as they are produced.
+
+        Each chunk is appended to the CSV and written as its own Parquet row group,
+        so only one chunk needs to be in memory. The chunks go to temp outputs that
+        replace the stored ones at the end, unless the content hash shows the data
+        is unchanged; in-place sinks such as SQLite are updated chunk by chunk.
+        Returns the number of rows saved.
+        """
+        sinks = DataSaver.open_sinks(output_dir, name, formats)
+        temp_sinks = {
+            fmt: (sink, staging_path(sink, path)) for fmt, (sink, path) in sinks.items()
+        }
+        staged = [
+            (temp_path, path)
+            for (_, temp_path), (_, path) in zip(temp_sinks.values(), sinks.values())
+            if temp_path != path
+        ]
+        digest = hashlib.sha256()
+        # Row hashes and dates of every chunk, 16 bytes per row
+        chunk_hashes, chunk_dates = [], []
+        rows = 0
+        seconds = dict.fromkeys(sinks, 0.0)
+        try:
+            for chunk in chunks:
+                if rows == 0:
+                    DataSaver.check_duplicate_columns(chunk)
+                    for temp_path, _ in staged:
+                        remove_path(temp_path)
+                first = rows == 0
+                chunk_hashes.append(row_hashes(chunk))
+                chunk_dates.append(date_values(chunk.index))
+                update_hash(digest, chunk, header=first, hashes=chunk_hashes[-1])
+                report = DataSaver.run_sinks(
+                    temp_sinks, lambda sink, path: sink.write_chunk(chunk, path, first)
+                )
+                for fmt, result in report.items():
+                    seconds[fmt] += result["seconds"]
+                rows += len(chunk)
+        except Exception as e:
+            logging.error(f"Failed to save data chunks: {e}", exc_info=True)
+            for sink, _ in temp_sinks.values():
+                sink.close()
+            for temp_path, _ in staged:
+                remove_path(temp_path)
+            raise
+        for sink, _ in sinks.values():
+            sink.close()
+        if not rows:
+            logging.info(f"Saved 0 rows in chunks of {name}")
+            return rows
+
+        content_hash = digest.hexdigest()
+        if DataSaver.is_unchanged(output_dir, name, sinks, content_hash):
+            logging.info(f"{name} is unchanged ({content_hash[:12]}), not saving")
+            for temp_path, _ in staged:
+                remove_path(temp_path)
+            return rows
+        for temp_path, path in staged:
+            replace_path(temp_path, path)
+        dates = None
+        if all(chunk is not None for chunk in chunk_dates):
+            dates = np.concatenate(chunk_dates)
+        DataSaver.write_row_hashes(
+            output_dir, name, dates, np.concatenate(chunk_hashes)
+        )
+        DataSaver.write_sidecar(
+            output_dir, name, {"hash": content_hash, "formats": list(sinks)}
+        )
+        DataSaver.log_report(
+            {
+                fmt: {
+                    "path": path,
+                    "seconds": seconds[fmt],
+                    "bytes": output_size(path),
+                }
+                for fmt, (_, path) in sinks.items()
+            }
+        )
+        logging.info(f"Saved {rows} rows in chunks of {name}")
+        return rows
+
+    @staticmethod
+    def read_partitioned(
+        path,
+        start=None,
+        end=None,
+        tickers=None,
+        columns=None,
+        partition_by=("year", "ticker"),
+        wide=False,
+    ):
+        """Read a partitioned dataset, pushing date and ticker filters into the scan.
+
+        Year and ticker filters prune partition directories, and the date range is
+        checked against each row group's statistics so non-matching groups are
+        never read. Returns the long frame indexed by date, or the original
+        `Field_TICKER` layout with `wide=True`.
+        """
+        dataset = ds.dataset(
+            path,
+            format="parquet",
+            partitioning=PartitionedParquetSink.partitioning(partition_by),
+        )
+        date = dataset.schema.names[0]
+        date_type = dataset.schema.field(date).type
+        conditions = []
+        if start is not None:
+            conditions.append(ds.field(date) >= scalar_for(start, date_type))
+            if "year" in partition_by:
+                conditions.append(ds.field("year") >= pd.Timestamp(start).year)
+        if end is not None:
+            conditions.append(ds.field(date) <= scalar_for(end, date_type))
+            if "year" in partition_by:
+                conditions.append(ds.field("year") <= pd.Timestamp(end).year)
+        if tickers is not None:
+            conditions.append(ds.field("ticker").isin(list(tickers)))
+        condition = None
+        for expression in conditions:
+            condition = expression if condition is None else condition & expression
+
+        if columns is not None:
+            columns = [date, "ticker"] + [
+                column for column in columns if column not in (date, "ticker")
+            ]
+        table = dataset.to_table(columns=columns, filter=condition)
+        data = table.to_pandas().drop(columns=["year"], errors="ignore")
+        data = data.sort_values(["ticker", date], kind="stable").set_index(date)
+        logging.info(f"Read {len(data)} rows from {path}")
+        if not wide:
+            return data
+
+        wide_data = data.pivot(columns="ticker")
+        wide_data.columns = [f"{field}_{ticker}" for field, ticker in wide_data.columns]
+        return wide_data.dropna(axis=1, how="all")
+
+    @staticmethod
+    def load_arrow(path, columns=None):
+        """Memory-map an `arrow` output and wrap its columns without copying.
+
+        Columns written from a single chunk without nulls come back as read-only
+        views of the mapped file, so processes loading the same file share the
+        page cache. Other columns, and files streamed in several chunks, are
+        converted normally.
+        """
+        table = feather.read_table(path, memory_map=True)
+        index_column = (table.schema.metadata or {}).get(b"index", b"").decode()
+        index_column = index_column or table.schema.names[0]
+        if columns is None:
+            columns = [name for name in table.schema.names if name != index_column]
+
+        data = {}
+        for name in columns:
+            column = table.column(name)
+            if column.num_chunks == 1 and column.null_count == 0:
+                try:
+                    data[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+                    continue
+                except pa.ArrowInvalid:
+                    pass
+            data[name] = column.to_pandas().array
+        index = pd.Index(table.column(index_column).to_pandas(), name=index_column)
+        return pd.DataFrame(data, index=index, copy=False)
+
+    @staticmethod
+    def csv_tail_offset(csv_path, since, block_size=1 << 16):
+        """Byte offset of the first CSV row dated on or after `since`.
+
+        The file is scanned backwards from the end, so only the replaced tail and
+        one extra row are read regardless of the file size.
+        """
+        since = pd.Timestamp(since)
+        with open(csv_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()  # start of the earliest row found on or after `since`
+            buffer_start = offset
+            buffer = b""
+            while True:
+                body = buffer[:-1] if buffer.endswith(b"\n") else buffer
+                newline = body.rfind(b"\n")
+                if newline == -1 and buffer_start > 0:
+                    read_size = min(block_size, buffer_start)
+                    buffer_start -= read_size
+                    f.seek(buffer_start)
+                    buffer = f.read(read_size) + buffer
+                    continue
+                if newline == -1:
+                    # Only the header is left
+                    return offset
+                line = body[newline + 1 :]
+                if (
+                    line.strip()
+                    and pd.Timestamp(line.split(b",", 1)[0].decode()) < since
+                ):
+                    return offset
+                offset = buffer_start + newline + 1
+                buffer = buffer[: newline + 1]
+
+    @staticmethod
+    def append_csv(data, csv_path, since):
+        """Replace the CSV rows from `since` onwards with the rows of `data`.
+
+        The CSV is copied to a temp file, truncated at `since` and appended to
+        there, then renamed over the original, so an interrupted append leaves the
+        stored file as it was.
+        """
+        with open(csv_path) as f:
+            header = f.readline()
+        if header != data.iloc[:0].to_csv(index=True):
+            raise ValueError(f"Columns of {csv_path} differ from the appended data")
+
+        offset = DataSaver.csv_tail_offset(csv_path, since)
+
+        def write(temp_path):
+            shutil.copyfile(csv_path, temp_path)
+            with open(temp_path, "r+b") as f:
+                f.truncate(offset)
+            data.to_csv(temp_path, mode="a", header=False, index=True)
+
+        DataSaver.write_atomic(csv_path, write)
+        logging.info(f"Appended {len(data)} rows to {csv_path} from {since}")
+
+    @staticmethod
+    def append_parquet(data, parquet_path, since):
+        """Replace the rows from `since` onwards in a Parquet file.
+
+        Parquet files cannot be appended in place, so the kept rows are copied
+        row group by row group as Arrow data, without a pandas round-trip.
+        """
+        existing = pq.ParquetFile(parquet_path)
+        schema = existing.schema_arrow
+        tail = pa.Table.from_pandas(data, preserve_index=True)
+        if tail.schema.names != schema.names:
+            raise ValueError(f"Columns of {parquet_path} differ from the appended data")
+        tail = tail.cast(schema)
+        index_column = schema.pandas_metadata["index_columns"][0]
+        cutoff = pa.scalar(pd.Timestamp(since), type=schema.field(index_column).type)
+
+        def write(temp_path):
+            with pq.ParquetWriter(temp_path, schema) as writer:
+                for i in range(existing.num_row_groups):
+                    group = existing.read_row_group(i)
+                    kept = group.filter(pc.less(group[index_column], cutoff))
+                    if kept.num_rows:
+                        writer.write_table(kept)
+                writer.write_table(tail)
+
+        DataSaver.write_atomic(parquet_path, write)
+        logging.info(f"Appended {len(data)} rows to {parquet_path} from {since}")
+
+    @staticmethod
+    def append_data(data, output_dir, name="merged_data", formats=None):
+        """Replace the stored rows from data's first date onwards with `data`.
+
+        Each output is appended to through a temp copy that replaces it when
+        complete (SQLite in one transaction). The sidecar is marked dirty first,
+        so outputs left out of step by a failed append are not taken as unchanged.
+        The stored row hashes before the cut and those of `data` then give the
+        content hash of the whole output, as a full save of it would, and an
+        append leaving the content as it is is skipped.
+        """
+        sinks = DataSaver.open_sinks(output_dir, name, formats)
+        if not all(os.path.exists(path) for _, path in sinks.values()):
+            return DataSaver.save_data(data, output_dir, name, formats)
+
+        since = data.index[0]
+        sidecar = DataSaver.read_sidecar(output_dir, name)
+        stored = DataSaver.read_row_hashes(output_dir, name)
+        new_dates = date_values(data.index)
+        content_hash = None
+        if stored is not None and new_dates is not None:
+            stored_dates, stored_hashes = stored
+            kept = stored_dates < new_dates[0]
+            dates = np.concatenate([stored_dates[kept], new_dates])
+            hashes = np.concatenate([stored_hashes[kept], row_hashes(data)])
+            content_hash = update_hash(hashlib.sha256(), data, hashes=hashes)
+            content_hash = content_hash.hexdigest()
+            if DataSaver.is_unchanged(output_dir, name, sinks, content_hash):
+                logging.info(f"Rows from {since} are already appended to {name}")
+                return {}
+        if sidecar is not None:
+            DataSaver.write_sidecar(output_dir, name, {**sidecar, "dirty": True})
+        try:
+            report = DataSaver.run_sinks(
+                sinks, lambda sink, path: sink.append(data, path, since)
+            )
+        except Exception as e:
+            logging.error(f"Failed to append data: {e}", exc_info=True)
+            raise
+        if content_hash is None:
+            # Outputs saved before row hashes were kept have nothing to rehash
+            logging.info(f"No stored hash for {name}; it is set by the next full save")
+            remove_path(DataSaver.sidecar_path(output_dir, name))
+        else:
+            DataSaver.write_row_hashes(output_dir, name, dates, hashes)
+            DataSaver.write_sidecar(
+                output_dir, name, {"hash": content_hash, "formats": list(sinks)}
+            )
+        DataSaver.log_report(report, verb="Appended")
+        return report
+
+    @staticmethod
+    def check_duplicate_columns(data):
         if data.columns.duplicated().any():
             duplicates = data.columns[data.columns.duplicated()].tolist()
             logging.error(f"Duplicate column names found: {duplicates}")
             raise ValueError(f"Duplicate column names detected: {duplicates}")
 
-        DataSaver.save_data(data, output_dir, name)
+    @staticmethod
+    def validate_and_save(
+        data, output_dir, name="validated_data", append=False, formats=None
+    ):
+        """Validate for duplicate columns and save (or append) the data."""
+        DataSaver.check_duplicate_columns(data)
+        if append:
+            return DataSaver.append_data(data, output_dir, name, formats)
+        return DataSaver.save_data(data, output_dir, name, formats)
+
+    @staticmethod
+    def save_gap_mask(gap_mask, output_dir, name="merged_data"):
+        """Save the bit-packed gap mask of a saved dataset next to it."""
+        mask_path = os.path.join(output_dir, f"{name}_gap_mask.npz")
+        gap_mask.save(mask_path)
+        logging.info(f"Saved gap mask to {mask_path}")
+        return mask_path
+
+    @staticmethod
+    def append_gap_mask(gap_mask, output_dir, name, kept_rows, stored_rows):
+        """Replace the rows of the saved gap mask from `kept_rows` on with `gap_mask`.
+
+        The saved mask must cover the `stored_rows` rows the dataset held before
+        the append. Otherwise it no longer describes the data and is removed.
+        """
+        mask_path = os.path.join(output_dir, f"{name}_gap_mask.npz")
+        stored = GapMask.load(mask_path) if os.path.exists(mask_path) else None
+        if (
+            stored is None
+            or stored.rows != stored_rows
+            or stored.columns != gap_mask.columns
+        ):
+            if stored is not None:
+                logging.warning(f"Removing {mask_path}, which no longer matches {name}")
+            remove_path(mask_path)
+            return None
+        merged = GapMask.concat([stored.head(kept_rows), gap_mask])
+        return DataSaver.save_gap_mask(merged, output_dir, name)
@@ -0,0 +1,146 @@
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from sqlite_store import TABLE_FIELDS, date_strings, store_version
+
+# Rows pulled from SQLite per fetchmany call
+FETCH_ROWS = 4096
+
+# Bounds of an open-ended date range, as stored date text
+FIRST_DATE = ""
+LAST_DATE = "9999-12-31"
+
+
+def range_sql(table, columns):
+    """Statements counting and reading one ticker's rows over a date range.
+
+    The SQL text only depends on the table and columns, so sqlite3 prepares it
+    once and reuses it from its statement cache for every ticker and range.
+    """
+    where = f"FROM {table} WHERE ticker = ? AND date >= ? AND date <= ?"
+    select = f"SELECT date, {', '.join(columns)} {where} ORDER BY date"
+    return f"SELECT COUNT(*) {where}", select
+
+
+def table_fields(fields):
+    """Group the requested fields by table as [(table, fields, columns)]."""
+    known = {field for columns in TABLE_FIELDS.values() for field in columns}
+    unknown = [field for field in fields if field not in known]
+    if unknown:
+        raise ValueError(f"Unsupported fields: {unknown}")
+    groups = []
+    for table, columns in TABLE_FIELDS.items():
+        selected = [field for field in fields if field in columns]
+        if selected:
+            groups.append((table, selected, [columns[f] for f in selected]))
+    return groups
+
+
+class StoreReader:
+    """Reads wide `Field_TICKER` frames for date ranges out of the SQLite store.
+
+    Each ticker is read with one prepared range statement over the covering
+    `(ticker, date)` index, streamed with `fetchmany` into arrays allocated from
+    the row count. Results are kept in an LRU of `cache_size` entries keyed on
+    (tickers, fields, range, store version), so repeating a query is free until
+    the store is written to.
+    """
+
+    def __init__(self, path, cache_size=32, fetch_rows=FETCH_ROWS):
+        self.conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, isolation_level=None
+        )
+        self.cache_size = cache_size
+        self.fetch_rows = fetch_rows
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def query(self, tickers, fields=("Close",), start=None, end=None):
+        """Wide frame of `fields` for `tickers` between `start` and `end` inclusive.
+
+        Columns come ticker by ticker in the requested order, and tickers without
+        rows in a field's table are left out. The frame is a shallow copy of the
+        cached one.
+        """
+        tickers, fields = tuple(tickers), tuple(fields)
+        start = FIRST_DATE if start is None else date_strings([start])[0]
+        end = LAST_DATE if end is None else date_strings([end])[0]
+        key = (tickers, fields, start, end, store_version(self.conn))
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key].copy(deep=False)
+
+        self.misses += 1
+        # One read transaction, so the counts, rows and version are one snapshot
+        self.conn.execute("BEGIN")
+        try:
+            key = key[:-1] + (store_version(self.conn),)
+            data = self.read(tickers, fields, start, end)
+        finally:
+            self.conn.execute("COMMIT")
+        self.cache[key] = data
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return data.copy(deep=False)
+
+    def read_ticker(self, statements, ticker, start, end, width):
+        """(dates, values) arrays of one ticker's rows, NULL becoming NaN."""
+        count_sql, select_sql = statements
+        (count,) = self.conn.execute(count_sql, (ticker, start, end)).fetchone()
+        dates = np.empty(count, dtype=object)
+        values = np.empty((count, width))
+        cursor = self.conn.execute(select_sql, (ticker, start, end))
+        row = 0
+        while rows := cursor.fetchmany(self.fetch_rows):
+            stop = row + len(rows)
+            dates[row:stop] = [r[0] for r in rows]
+            values[row:stop] = [r[1:] for r in rows]
+            row = stop
+        return dates, values
+
+    def read(self, tickers, fields, start, end):
+        """Pivot the rows of every ticker and field into one wide frame."""
+        groups = table_fields(fields)
+        columns, parts = [], []
+        for ticker in tickers:
+            for table, selected, table_columns in groups:
+                dates, values = self.read_ticker(
+                    range_sql(table, table_columns),
+                    ticker,
+                    start,
+                    end,
+                    len(table_columns),
+                )
+                if len(dates):
+                    columns.extend(f"{field}_{ticker}" for field in selected)
+                    parts.append((dates, values))
+
+        # Hash-based union and lookup; ISO date text sorts in date order
+        all_dates = pd.Index(
+            np.concatenate([dates for dates, _ in parts] or [[]]), dtype=object
+        )
+        all_dates = all_dates.unique().sort_values()
+        block = np.full((len(all_dates), len(columns)), np.nan)
+        column = 0
+        for dates, values in parts:
+            width = values.shape[1]
+            block[all_dates.get_indexer(dates), column : column + width] = values
+            column += width
+        index = pd.DatetimeIndex(
+            pd.to_datetime(all_dates.astype(str), format="ISO8601"), name="Date"
+        )
+        return pd.DataFrame(block, index=index, columns=columns)
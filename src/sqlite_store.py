@@ -0,0 +1,177 @@
+import logging
+import sqlite3
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from compact import split_columns, to_long
+
+# Tables as declared by the legacy `save_to_sqlite`, one row per date and ticker
+SCHEMAS = {
+    "yahoo_data": (
+        "CREATE TABLE IF NOT EXISTS yahoo_data (date TEXT, ticker TEXT, open REAL, "
+        "high REAL, low REAL, close REAL, volume INTEGER, PRIMARY KEY (date, ticker))"
+    ),
+    "fred_data": (
+        "CREATE TABLE IF NOT EXISTS fred_data (date TEXT, ticker TEXT, value REAL, "
+        "data_flag TEXT, PRIMARY KEY (date, ticker))"
+    ),
+}
+
+# Wide-frame fields stored in each table, mapped to their column
+TABLE_FIELDS = {
+    "yahoo_data": {
+        "Open": "open",
+        "High": "high",
+        "Low": "low",
+        "Close": "close",
+        "Volume": "volume",
+    },
+    "fred_data": {"Value": "value"},
+}
+
+# Columns stored as INTEGER
+INTEGER_COLUMNS = ("volume",)
+
+# Rows bound per executemany call, bounding the Python objects held at once
+DEFAULT_BATCH_ROWS = 50000
+
+
+def index_sql(table):
+    """Covering (ticker, date) index, so range reads never touch the table rows."""
+    columns = ", ".join(["ticker", "date", *TABLE_FIELDS[table].values()])
+    return (
+        f"CREATE INDEX IF NOT EXISTS {table}_ticker_date ON {table} ({columns})"
+    )
+
+
+def upsert_sql(table):
+    columns = ["date", "ticker", *TABLE_FIELDS[table].values()]
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[2:])
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (date, ticker) DO UPDATE SET {updates}"
+    )
+
+
+def connect(path, timeout=30.0):
+    """Open the store in WAL mode, creating its tables and indexes when missing.
+
+    WAL lets readers query while a save is running, and with synchronous=NORMAL
+    a commit only syncs at checkpoints instead of on every transaction.
+    """
+    conn = sqlite3.connect(path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # 64 MiB page cache, so index pages stay cached across a large upsert
+    conn.execute("PRAGMA cache_size=-65536")
+    with conn:
+        for table, schema in SCHEMAS.items():
+            conn.execute(schema)
+            conn.execute(index_sql(table))
+    return conn
+
+
+def store_version(conn):
+    """Version of the stored data, bumped by every `write_frame` transaction."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def date_strings(index):
+    """ISO text of each date, without the time when every timestamp is midnight."""
+    index = pd.DatetimeIndex(index).tz_localize(None)
+    if (index == index.normalize()).all():
+        return index.strftime("%Y-%m-%d")
+    return index.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def column_values(values, integer=False):
+    """Python objects of a float array for binding, NaN becoming NULL."""
+    missing = np.isnan(values)
+    if integer:
+        values = np.where(missing, 0, values).astype(np.int64)
+    column = values.astype(object)
+    column[missing] = None
+    return column
+
+
+def table_columns(data, table):
+    """Columns of the wide frame `data` that are stored in `table`."""
+    fields, _ = split_columns(data.columns)
+    return [
+        column
+        for column, field in zip(data.columns, fields)
+        if field in TABLE_FIELDS[table]
+    ]
+
+
+def table_rows(data, table):
+    """(date, ticker, *fields) tuples of the rows of `data` stored in `table`."""
+    long_data = to_long(data[table_columns(data, table)], downcast=False)
+    dates = date_strings(data.index)
+    positions = data.index.get_indexer(long_data.iloc[:, 0])
+    tickers = long_data["ticker"].cat
+    columns = [
+        dates.take(positions).tolist(),
+        np.array(tickers.categories, dtype=object).take(tickers.codes).tolist(),
+    ]
+    for field, column in TABLE_FIELDS[table].items():
+        if field in long_data:
+            values = long_data[field].to_numpy(dtype=float)
+        else:
+            values = np.full(len(long_data), np.nan)
+        columns.append(column_values(values, column in INTEGER_COLUMNS).tolist())
+    return zip(*columns)
+
+
+def upsert(conn, table, rows, batch_rows=DEFAULT_BATCH_ROWS):
+    """Insert or update `rows` with one executemany per batch; returns the row count."""
+    sql = upsert_sql(table)
+    rows = iter(rows)
+    count = 0
+    while batch := list(islice(rows, batch_rows)):
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def write_frame(path, data, since=None, batch_rows=DEFAULT_BATCH_ROWS, tables=None):
+    """Upsert a wide `Field_TICKER` frame into the store in a single transaction.
+
+    Yahoo fields go to `yahoo_data` and FRED `Value` columns to `fred_data`, or
+    only to the tables listed in `tables`. Rows already stored for other dates or
+    tickers are kept; with `since`, the stored rows of the frame's tickers from
+    that date on are deleted first, so the frame replaces the tail. Returns the
+    number of rows written per table.
+    """
+    fields, _ = split_columns(data.columns)
+    known = {field for table_fields in TABLE_FIELDS.values() for field in table_fields}
+    unknown = sorted(set(fields) - known)
+    if unknown:
+        logging.warning(f"Fields {unknown} have no SQLite column and are not stored")
+
+    counts = {}
+    conn = connect(path)
+    try:
+        with conn:
+            for table in TABLE_FIELDS if tables is None else tables:
+                columns = table_columns(data, table)
+                if not columns:
+                    continue
+                if since is not None:
+                    tickers = list(dict.fromkeys(split_columns(columns)[1]))
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE ticker IN "
+                        f"({', '.join('?' * len(tickers))}) AND date >= ?",
+                        [*tickers, date_strings([since])[0]],
+                    )
+                counts[table] = upsert(conn, table, table_rows(data, table), batch_rows)
+            # Inside the transaction, so readers see the new version with the rows
+            conn.execute(f"PRAGMA user_version = {store_version(conn) + 1}")
+    finally:
+        conn.close()
+    logging.info(f"Upserted {counts} rows into {path}")
+    return counts
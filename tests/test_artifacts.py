@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from artifacts import ArtifactStore
+
+
+def frame(offset=0.0):
+    dates = pd.bdate_range("2020-01-01", periods=100, name="Date")
+    return pd.DataFrame({"Close_SPY": np.arange(100.0) + offset}, index=dates)
+
+
+def test_frames_stay_in_memory_within_budget(tmp_path):
+    store = ArtifactStore(tmp_path, memory_budget=1 << 20)
+    data = frame()
+    store.put("prices", data)
+
+    assert store.get("prices") is data
+    assert os.listdir(tmp_path) == []
+
+
+def test_oldest_frames_spill_over_budget(tmp_path):
+    store = ArtifactStore(tmp_path, memory_budget=2000)
+    store.put("first", frame())
+    store.put("second", {"a": frame(1.0), "b": frame(2.0)})
+
+    assert sorted(os.listdir(tmp_path)) == ["first.arrow"]
+    assert store.memory_used() > 2000  # the newest artifact is always kept
+    loaded = store.get("first")
+    pd.testing.assert_frame_equal(loaded, frame(), check_freq=False)
+    assert not loaded["Close_SPY"].to_numpy().flags.writeable
+
+    store.put("third", frame(3.0))
+    pd.testing.assert_frame_equal(
+        store.get("second")["b"], frame(2.0), check_freq=False
+    )
+
+    store.release("first")
+    assert "first" not in store
+    assert sorted(os.listdir(tmp_path)) == ["second.arrow"]
+
+
+def test_persisted_frames_outlive_the_store(tmp_path):
+    store = ArtifactStore(tmp_path)
+    store.put("prices", frame(), persist=True)
+    store.put("scratch", frame())
+    store.close()
+
+    assert os.listdir(tmp_path) == ["prices.arrow"]
+    assert "prices" not in store
+    with pytest.raises(ValueError, match="Only frames"):
+        store.put("dates", "2020-01-02", persist=True)
@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+
+from cache_manifest import CacheManifest
+
+
+def write_parquet(path, rows):
+    pd.DataFrame({"Value": range(rows)}).to_parquet(path)
+    return path
+
+
+def test_manifest_evicts_least_recently_used(tmp_path):
+    manifest = CacheManifest(str(tmp_path))
+    first = write_parquet(os.path.join(tmp_path, "first.parquet"), 100)
+    second = write_parquet(os.path.join(tmp_path, "second.parquet"), 100)
+    manifest.record(first)
+    manifest.record(second)
+    manifest.entries["first.parquet"]["last_access"] = 0
+
+    # Budget for two files: recording a third evicts the least recently used one
+    manifest.max_bytes = manifest.total_bytes()
+    manifest.record(write_parquet(os.path.join(tmp_path, "third.parquet"), 100))
+
+    assert not os.path.exists(first)
+    assert sorted(manifest.entries) == ["second.parquet", "third.parquet"]
+    # The index is persisted next to the cache
+    assert sorted(CacheManifest(str(tmp_path)).entries) == sorted(manifest.entries)
+
+
+def test_manifest_detects_truncated_and_corrupt_files(tmp_path):
+    manifest = CacheManifest(str(tmp_path))
+    path = write_parquet(os.path.join(tmp_path, "series.parquet"), 1000)
+    manifest.record(path)
+    assert manifest.is_valid(path) and manifest.verify(path)
+
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 10)
+    assert not manifest.is_valid(path)
+
+    # Files written before the manifest existed are checked by their footer
+    untracked = write_parquet(os.path.join(tmp_path, "untracked.parquet"), 10)
+    with open(untracked, "r+b") as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b"XXXX")
+    assert not manifest.is_valid(untracked)
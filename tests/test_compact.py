@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from compact import memory_bytes, to_long, to_wide
+from saving import DataSaver
+
+
+def wide_data():
+    dates = pd.bdate_range("2020-01-01", periods=6, name="Date")
+    return pd.DataFrame(
+        {
+            "Close_SPY": [300.0, 301.0, 302.0, 303.0, 304.0, 305.0],
+            "Volume_SPY": [1e6, 2e6, 3e6, 4e6, 5e6, 6e6],
+            "Close_^VIX": [12.0, 13.0, np.nan, 15.0, 16.0, 17.0],
+            "Volume_^VIX": [0.0] * 6,
+            "Value_DGS10": [1.8, np.nan, 1.7, 1.6, 1.5, 1.4],
+        },
+        index=dates,
+    )
+
+
+def test_long_layout_round_trips_with_compact_dtypes():
+    long_data = to_long(wide_data())
+
+    assert list(long_data.columns) == ["Date", "ticker", "Close", "Volume", "Value"]
+    assert list(long_data["ticker"].cat.categories) == ["SPY", "^VIX", "DGS10"]
+    assert str(long_data["Volume"].dtype) == "UInt32"
+    # The DGS10 date without a value has no row
+    assert len(long_data) == 6 + 6 + 5
+    pd.testing.assert_frame_equal(to_wide(long_data), wide_data(), check_freq=False)
+
+
+def test_float32_prices_shrink_the_frame():
+    data = wide_data()
+    compact = to_long(data, float32_prices=True)
+
+    assert compact["Close"].dtype == np.float32
+    assert memory_bytes(compact) < memory_bytes(to_long(data))
+    np.testing.assert_allclose(
+        to_wide(compact).to_numpy(dtype=float), data.to_numpy(), rtol=1e-6
+    )
+
+
+def test_compact_sink_appends_rows(tmp_path):
+    data = wide_data()
+    DataSaver.save_data(data[:4], tmp_path, formats=["compact"])
+    DataSaver.append_data(data[3:], tmp_path, formats=["compact"])
+
+    stored = pd.read_parquet(tmp_path / "merged_data.compact.parquet")
+    pd.testing.assert_frame_equal(
+        to_wide(stored.reset_index()), data, check_freq=False
+    )
@@ -1,7 +1,10 @@
 import pandas as pd
+import pyarrow.parquet as pq
 import pytest
 
-from merging import DataMerger
+from gap_fill import GapMask
+from merging import CHUNK_COPIES, DataMerger
+from saving import DataSaver
 
 
 def test_data_merger_with_trading_day_alignment():
@@ -29,3 +32,261 @@ def test_data_merger_with_trading_day_alignment():
 
     # Assert merged_data contains both Yahoo and FRED columns
     assert "Value_BAMLH0A0HYM2" in merged_data.columns
+
+
+def loop_merge(yahoo_data, fred_data_dict):
+    """Reference per-date alignment the vectorized engine must reproduce."""
+    merged_data = yahoo_data.copy()
+    for series_name, fred_data in fred_data_dict.items():
+        aligned_data = pd.DataFrame(index=yahoo_data.index)
+        for date in yahoo_data.index:
+            value = fred_data.loc[date, "Value"] if date in fred_data.index else None
+            aligned_data.loc[date, f"Value_{series_name}"] = value
+        aligned_data = aligned_data.astype(float).ffill().bfill()
+        merged_data = pd.concat([merged_data, aligned_data], axis=1)
+    return merged_data
+
+
+def test_vectorized_merge_matches_loop(caplog):
+    dates = pd.bdate_range("2020-01-01", periods=60)
+    yahoo_data = pd.DataFrame({"Close_SPY": range(60)}, index=dates, dtype=float)
+    fred_data_dict = {
+        # Starts late, with a missing observation and off-calendar dates
+        "DGS10": pd.DataFrame(
+            {"Value": [float(i) for i in range(50)]},
+            index=pd.date_range("2020-01-10", periods=50, freq="D"),
+        ),
+        "WEEKLY": pd.DataFrame(
+            {"Value": [1.0, None, 3.0, 4.0]},
+            index=pd.to_datetime(
+                ["2020-01-03", "2020-01-10", "2020-01-17", "2020-02-07"]
+            ),
+        ),
+    }
+    expected = loop_merge(yahoo_data, fred_data_dict)
+
+    with caplog.at_level("INFO"):
+        merged_data = DataMerger.merge_datasets(yahoo_data, fred_data_dict)
+
+    pd.testing.assert_frame_equal(merged_data, expected)
+    assert "DGS10: 36 matches, 24 misses" in caplog.text
+    assert "WEEKLY: 4 matches, 56 misses" in caplog.text
+
+
+def test_align_series_handles_unsorted_and_duplicate_dates():
+    index = pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03", "2020-01-06"])
+    fred_data = pd.DataFrame(
+        {"Value": [3.0, 1.0, 2.0, 9.0]},
+        index=pd.to_datetime(["2020-01-03", "2020-01-01", "2020-01-02", "2020-01-02"]),
+    )
+
+    aligned, matches, misses = DataMerger.align_series(index, fred_data, "X")
+
+    assert aligned.name == "Value_X"
+    assert aligned.tolist()[:3] == [1.0, 2.0, 3.0]
+    assert (matches, misses) == (3, 1)
+
+
+def test_asof_alignment_respects_release_lag_and_staleness():
+    dates = pd.bdate_range("2020-01-01", "2020-04-30")
+    yahoo_data = pd.DataFrame({"Close_SPY": 1.0}, index=dates)
+    fred_data_dict = {
+        "MONTHLY": pd.DataFrame(
+            {"Value": [1.0, 2.0]}, index=pd.to_datetime(["2020-01-01", "2020-02-01"])
+        ),
+        "DAILY": pd.DataFrame(
+            {"Value": 5.0}, index=pd.bdate_range("2020-03-02", periods=3)
+        ),
+    }
+    series_options = {
+        "MONTHLY": {"frequency": "M", "release_lag": "5D", "max_staleness": "45D"},
+        "DAILY": {"frequency": "D"},
+    }
+
+    merged_data = DataMerger.merge_datasets(
+        yahoo_data, fred_data_dict, alignment="asof", series_options=series_options
+    )
+
+    monthly = merged_data["Value_MONTHLY"]
+    # Nothing is visible before its release, so there is no look-ahead
+    assert monthly[:"2020-01-05"].isna().all()
+    assert (monthly["2020-01-06":"2020-02-05"] == 1.0).all()
+    # The February value is released on the 6th and expires 45 days later
+    assert (monthly["2020-02-06":"2020-03-22"] == 2.0).all()
+    assert monthly["2020-03-23":].isna().all()
+
+    daily = merged_data["Value_DAILY"]
+    assert daily[:"2020-03-01"].isna().all()
+    assert (daily["2020-03-02":"2020-03-11"] == 5.0).all()
+    assert daily["2020-03-12":].isna().all()
+
+
+def test_incremental_merge_appends_to_saved_output(tmp_path):
+    dates = pd.bdate_range("2020-01-01", periods=40, name="Date")
+    yahoo_data = pd.DataFrame({"Close_SPY": range(40)}, index=dates, dtype=float)
+    fred_data = pd.DataFrame(
+        {"Value": [float(i) for i in range(0, 60, 2)]},
+        index=pd.date_range("2020-01-01", periods=30, freq="2D"),
+    )
+    # The last stored observation is revised by the later fetch
+    fred_revised = fred_data.copy()
+    fred_revised.iloc[20] = -1.0
+
+    merged_data, gap_mask = DataMerger.merge_datasets(
+        yahoo_data[:30].copy(), {"DGS10": fred_data[:21]}, return_gap_mask=True
+    )
+    DataSaver.save_data(merged_data, tmp_path)
+    DataSaver.save_gap_mask(gap_mask, tmp_path)
+    existing = pd.read_parquet(
+        tmp_path / "merged_data.parquet", columns=["Value_DGS10"]
+    )
+    tail, tail_mask = DataMerger.merge_incremental(
+        existing,
+        yahoo_data.copy(),
+        {"DGS10": fred_revised},
+        revision_window=5,
+        return_gap_mask=True,
+    )
+    DataSaver.append_data(tail, tmp_path)
+    DataSaver.append_gap_mask(tail_mask, tmp_path, "merged_data", 25, len(existing))
+
+    assert tail.index[0] == dates[25]
+    expected, expected_mask = DataMerger.merge_datasets(
+        yahoo_data.copy(), {"DGS10": fred_revised}, return_gap_mask=True
+    )
+    saved_mask = GapMask.load(tmp_path / "merged_data_gap_mask.npz")
+    assert (saved_mask.unpack() == expected_mask.unpack()).all()
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "merged_data.parquet"), expected, check_freq=False
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "merged_data.csv", index_col=0, parse_dates=True),
+        expected,
+        check_freq=False,
+    )
+
+
+def chunk_budget(yahoo_data, fred_data_dict, rows):
+    """Streaming budget giving chunks of `rows` rows."""
+    return rows * CHUNK_COPIES * DataMerger.row_bytes(yahoo_data, fred_data_dict)
+
+
+@pytest.mark.parametrize("alignment", ["exact", "asof"])
+def test_streaming_merge_matches_full_merge(tmp_path, alignment):
+    dates = pd.bdate_range("2020-01-01", periods=60, name="Date")
+    yahoo_data = pd.DataFrame({"Close_SPY": range(60)}, index=dates, dtype=float)
+    fred_data_dict = {
+        # Starts after the first chunk, so that chunk is back-filled
+        "DGS10": pd.DataFrame(
+            {"Value": [float(i) for i in range(40)]},
+            index=pd.date_range("2020-01-20", periods=40, freq="D"),
+        ),
+        "WEEKLY": pd.DataFrame(
+            {"Value": [1.0, None, 3.0, 4.0]},
+            index=pd.to_datetime(
+                ["2020-01-03", "2020-01-10", "2020-01-17", "2020-02-07"]
+            ),
+        ),
+    }
+    expected = DataMerger.merge_datasets(
+        yahoo_data.copy(), fred_data_dict, alignment=alignment
+    )
+
+    chunks = DataMerger.merge_chunks(
+        yahoo_data,
+        fred_data_dict,
+        memory_budget=chunk_budget(yahoo_data, fred_data_dict, rows=8),
+        alignment=alignment,
+    )
+    assert DataSaver.save_chunks(chunks, tmp_path) == 60
+
+    saved = pd.read_parquet(tmp_path / "merged_data.parquet")
+    assert pq.ParquetFile(tmp_path / "merged_data.parquet").num_row_groups == 8
+    pd.testing.assert_frame_equal(saved, expected, check_freq=False)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "merged_data.csv", index_col=0, parse_dates=True),
+        expected,
+        check_freq=False,
+    )
+
+
+def test_streaming_budget_too_small_for_a_row_is_rejected():
+    dates = pd.bdate_range("2020-01-01", periods=10, name="Date")
+    yahoo_data = pd.DataFrame({"Close_SPY": range(10)}, index=dates, dtype=float)
+    fred_data_dict = {"DGS10": pd.DataFrame({"Value": [1.0]}, index=dates[:1])}
+    budget = chunk_budget(yahoo_data, fred_data_dict, rows=1) - 1
+
+    chunks = DataMerger.merge_chunks(yahoo_data, fred_data_dict, budget)
+    with pytest.raises(ValueError, match="cannot hold one merged row"):
+        next(chunks)
+
+
+def test_interpolated_merge_masks_filled_cells_and_streams_alike():
+    dates = pd.bdate_range("2020-01-01", periods=30, name="Date")
+    yahoo_data = pd.DataFrame({"Close_SPY": range(30)}, index=dates, dtype=float)
+    # Weekly observations leave gaps spanning several 4-row chunks
+    fred_data_dict = {
+        "WEEKLY": pd.DataFrame(
+            {"Value": [1.0, 2.0, 4.0]},
+            index=pd.to_datetime(["2020-01-03", "2020-01-24", "2020-02-07"]),
+        ),
+    }
+
+    merged_data, gap_mask = DataMerger.merge_datasets(
+        yahoo_data.copy(),
+        fred_data_dict,
+        missing_data_handling="interpolate",
+        return_gap_mask=True,
+    )
+
+    observed = merged_data.index.isin(fred_data_dict["WEEKLY"].index)
+    assert (gap_mask.column("Value_WEEKLY") == ~observed).all()
+    # Six of the fifteen rows from 1.0 on 2020-01-03 to 2.0 on 2020-01-24
+    assert merged_data.loc["2020-01-13", "Value_WEEKLY"] == pytest.approx(1.4)
+
+    chunks, masks = zip(
+        *DataMerger.merge_chunks(
+            yahoo_data,
+            fred_data_dict,
+            memory_budget=chunk_budget(yahoo_data, fred_data_dict, rows=4),
+            missing_data_handling="interpolate",
+            return_gap_mask=True,
+        )
+    )
+    pd.testing.assert_frame_equal(pd.concat(chunks), merged_data)
+    # 4-row chunks start mid-byte, so concatenating them shifts the packed bits
+    assert (GapMask.concat(masks).unpack() == gap_mask.unpack()).all()
+
+
+def test_streaming_fill_skips_missing_and_duplicate_observations():
+    dates = pd.bdate_range("2020-01-01", periods=30, name="Date")
+    yahoo_data = pd.DataFrame({"Close_SPY": range(30)}, index=dates, dtype=float)
+    # Raw FRED rows: unsorted, a NaN observation and a duplicated date whose
+    # first row is NaN, so the next usable value lies several chunks ahead
+    fred_data_dict = {
+        "RAW": pd.DataFrame(
+            {"Value": [9.0, 1.0, None, None, 5.0, 7.0]},
+            index=pd.to_datetime(
+                [
+                    "2020-02-07",
+                    "2020-01-02",
+                    "2020-01-10",
+                    "2020-01-20",
+                    "2020-01-20",
+                    "2020-01-31",
+                ]
+            ),
+        ),
+    }
+    expected = DataMerger.merge_datasets(
+        yahoo_data.copy(), fred_data_dict, missing_data_handling="interpolate"
+    )
+
+    chunks = DataMerger.merge_chunks(
+        yahoo_data,
+        fred_data_dict,
+        memory_budget=chunk_budget(yahoo_data, fred_data_dict, rows=3),
+        missing_data_handling="interpolate",
+    )
+
+    pd.testing.assert_frame_equal(pd.concat(list(chunks)), expected)
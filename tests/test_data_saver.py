@@ -0,0 +1,324 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import saving
+from saving import DataSaver
+
+
+def sample_data():
+    dates = pd.bdate_range("2020-01-01", periods=10, name="Date")
+    return pd.DataFrame({"Close_SPY": range(10)}, index=dates, dtype=float)
+
+
+def test_save_data_writes_only_selected_formats(tmp_path):
+    report = DataSaver.save_data(sample_data(), tmp_path, formats=["parquet"])
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "merged_data.hash.json",
+        "merged_data.hash.npz",
+        "merged_data.parquet",
+    ]
+    assert report["parquet"]["bytes"] == os.path.getsize(
+        tmp_path / "merged_data.parquet"
+    )
+    assert report["parquet"]["seconds"] >= 0
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "merged_data.parquet"),
+        sample_data(),
+        check_freq=False,
+    )
+
+
+def test_save_data_runs_sinks_concurrently(tmp_path, monkeypatch):
+    # Each sink waits for the other to start; sequential writes would time out
+    barrier = threading.Barrier(2, timeout=10)
+
+    class WaitingSink(saving.CsvSink):
+        def write(self, data, path):
+            barrier.wait()
+            super().write(data, path)
+
+    class WaitingTextSink(WaitingSink):
+        extension = "txt"
+
+    monkeypatch.setitem(saving.SINKS, "csv", WaitingSink)
+    monkeypatch.setitem(saving.SINKS, "txt", WaitingTextSink)
+
+    report = DataSaver.save_data(sample_data(), tmp_path, formats=["csv", "txt"])
+
+    assert sorted(report) == ["csv", "txt"]
+    assert sorted(os.listdir(tmp_path)) == [
+        "merged_data.csv",
+        "merged_data.hash.json",
+        "merged_data.hash.npz",
+        "merged_data.txt",
+    ]
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported output formats"):
+        DataSaver.save_data(sample_data(), tmp_path, formats=["xlsx"])
+
+
+def wide_data():
+    dates = pd.bdate_range("2019-12-02", "2020-02-28", name="Date")
+    return pd.DataFrame(
+        {
+            "Close_SPY": range(len(dates)),
+            "Close_^VIX": range(100, 100 + len(dates)),
+            "Value_DGS10": [1.0, None] * (len(dates) // 2) + [1.0] * (len(dates) % 2),
+        },
+        index=dates,
+        dtype=float,
+    )
+
+
+def test_partitioned_dataset_reads_back_filtered(tmp_path):
+    formats = {"partitioned": {"row_group_size": 10}}
+    DataSaver.save_data(wide_data(), tmp_path, formats=formats)
+
+    path = tmp_path / "merged_data.dataset"
+    assert sorted(os.listdir(path)) == ["year=2019", "year=2020"]
+    assert "ticker=SPY" in os.listdir(path / "year=2020")
+
+    data = DataSaver.read_partitioned(
+        path, start="2020-01-06", end="2020-01-31", tickers=["SPY", "^VIX"]
+    )
+    assert set(data["ticker"]) == {"SPY", "^VIX"}
+    assert data.index.min() == pd.Timestamp("2020-01-06")
+    assert data.index.max() == pd.Timestamp("2020-01-31")
+
+    wide = DataSaver.read_partitioned(path, wide=True)
+    expected = wide_data()
+    pd.testing.assert_frame_equal(
+        wide[expected.columns], expected, check_freq=False, check_names=False
+    )
+
+
+def test_partitioned_append_replaces_tail(tmp_path):
+    full = wide_data()
+    formats = {"partitioned": {"partition_by": ["year"]}}
+    DataSaver.save_data(full[:40], tmp_path, formats=formats)
+
+    revised = full[35:] + 0.5
+    DataSaver.append_data(revised, tmp_path, formats=formats)
+
+    expected = pd.concat([full[:35], revised])
+    wide = DataSaver.read_partitioned(
+        tmp_path / "merged_data.dataset", partition_by=["year"], wide=True
+    )
+    pd.testing.assert_frame_equal(
+        wide[expected.columns], expected, check_freq=False, check_names=False
+    )
+
+
+def test_failed_append_keeps_outputs_and_marks_sidecar_dirty(tmp_path, monkeypatch):
+    full = wide_data()
+    formats = {"csv": {}, "partitioned": {"partition_by": ["year"]}}
+    DataSaver.save_data(full[:40], tmp_path, formats=formats)
+    csv_before = (tmp_path / "merged_data.csv").read_bytes()
+    write_table = saving.PartitionedParquetSink.write_table
+    to_csv = pd.DataFrame.to_csv
+
+    def fail_on_append(self, table, path, basename):
+        if basename.startswith("append"):
+            raise OSError("disk full")
+        write_table(self, table, path, basename)
+
+    def partial_csv(self, path=None, *args, mode="w", **kwargs):
+        if mode == "a":
+            with open(path, "a") as f:
+                f.write("2020-02-")
+            raise OSError("disk full")
+        return to_csv(self, path, *args, mode=mode, **kwargs)
+
+    monkeypatch.setattr(saving.PartitionedParquetSink, "write_table", fail_on_append)
+    monkeypatch.setattr(pd.DataFrame, "to_csv", partial_csv)
+    with pytest.raises(OSError):
+        DataSaver.append_data(full[35:] + 0.5, tmp_path, formats=formats)
+    monkeypatch.undo()
+
+    # Both outputs are as they were, and their hash is no longer trusted
+    assert (tmp_path / "merged_data.csv").read_bytes() == csv_before
+    wide = DataSaver.read_partitioned(
+        tmp_path / "merged_data.dataset", partition_by=["year"], wide=True
+    )
+    pd.testing.assert_frame_equal(
+        wide[full.columns], full[:40], check_freq=False, check_names=False
+    )
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+    assert DataSaver.stored_hash(tmp_path) is None
+    assert set(DataSaver.save_data(full[:40], tmp_path, formats=formats)) == {
+        "csv",
+        "partitioned",
+    }
+
+
+def test_append_stores_the_content_hash_of_the_whole_output(tmp_path):
+    full = wide_data()
+    DataSaver.save_data(full[:40], tmp_path)
+    revised = full[35:] + 0.5
+    expected = pd.concat([full[:35], revised])
+
+    DataSaver.append_data(revised, tmp_path)
+
+    assert DataSaver.stored_hash(tmp_path) == DataSaver.content_hash(expected)
+    # Saving or appending the same content again writes nothing
+    mtime = os.path.getmtime(tmp_path / "merged_data.parquet")
+    assert DataSaver.save_data(expected, tmp_path) == {}
+    assert DataSaver.append_data(revised, tmp_path) == {}
+    assert os.path.getmtime(tmp_path / "merged_data.parquet") == mtime
+
+
+def test_failed_parquet_append_leaves_no_temp_file(tmp_path, monkeypatch):
+    full = wide_data()
+    DataSaver.save_data(full[:40], tmp_path, formats=["parquet"])
+    before = (tmp_path / "merged_data.parquet").read_bytes()
+
+    def fail(self, table, *args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(saving.pq.ParquetWriter, "write_table", fail)
+    with pytest.raises(OSError):
+        DataSaver.append_data(full[35:] + 0.5, tmp_path, formats=["parquet"])
+
+    assert (tmp_path / "merged_data.parquet").read_bytes() == before
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_unchanged_data_is_not_rewritten(tmp_path):
+    DataSaver.save_data(sample_data(), tmp_path)
+    content_hash = DataSaver.stored_hash(tmp_path)
+    mtime = os.path.getmtime(tmp_path / "merged_data.parquet")
+
+    assert DataSaver.save_data(sample_data(), tmp_path) == {}
+    assert os.path.getmtime(tmp_path / "merged_data.parquet") == mtime
+    assert content_hash == DataSaver.content_hash(sample_data())
+
+    changed = sample_data() + 1
+    assert set(DataSaver.save_data(changed, tmp_path)) == {"csv", "parquet"}
+    assert DataSaver.stored_hash(tmp_path) == DataSaver.content_hash(changed)
+    assert not any(file_name.endswith(".tmp") for file_name in os.listdir(tmp_path))
+
+
+def test_failed_write_keeps_previous_output(tmp_path, monkeypatch):
+    DataSaver.save_data(sample_data(), tmp_path, formats=["parquet"])
+
+    def fail(self, data, path):
+        with open(path, "w") as f:
+            f.write("partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(saving.ParquetSink, "write", fail)
+    with pytest.raises(OSError):
+        DataSaver.save_data(sample_data() + 1, tmp_path, formats=["parquet"])
+
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "merged_data.parquet"),
+        sample_data(),
+        check_freq=False,
+    )
+    assert DataSaver.stored_hash(tmp_path) == DataSaver.content_hash(sample_data())
+    assert sorted(os.listdir(tmp_path)) == [
+        "merged_data.hash.json",
+        "merged_data.hash.npz",
+        "merged_data.parquet",
+    ]
+
+
+def test_streamed_chunks_hash_like_the_whole_frame(tmp_path):
+    data = sample_data()
+    DataSaver.save_chunks([data[:4], data[4:]], tmp_path)
+
+    assert DataSaver.stored_hash(tmp_path) == DataSaver.content_hash(data)
+    assert DataSaver.save_data(data, tmp_path) == {}
+
+
+def test_arrow_output_loads_as_mapped_views(tmp_path):
+    data = sample_data()
+    data.loc[data.index[3], "Close_SPY"] = np.nan
+    DataSaver.save_data(data, tmp_path, formats=["arrow"])
+
+    loaded = DataSaver.load_arrow(tmp_path / "merged_data.arrow")
+
+    pd.testing.assert_frame_equal(loaded, data, check_freq=False)
+    values = loaded["Close_SPY"].to_numpy()
+    # Read-only because it points into the mapped file rather than a copy
+    assert not values.flags.writeable
+
+
+def test_arrow_output_appends_and_streams(tmp_path):
+    data = sample_data()
+    DataSaver.save_data(data[:6], tmp_path, formats=["arrow"])
+    DataSaver.append_data(data[4:] * 2, tmp_path, formats=["arrow"])
+    expected = pd.concat([data[:4], data[4:] * 2])
+    pd.testing.assert_frame_equal(
+        DataSaver.load_arrow(tmp_path / "merged_data.arrow"),
+        expected,
+        check_freq=False,
+    )
+
+    DataSaver.save_chunks(
+        [data[:3], data[3:]], tmp_path, name="streamed", formats=["arrow"]
+    )
+    pd.testing.assert_frame_equal(
+        DataSaver.load_arrow(tmp_path / "streamed.arrow"), data, check_freq=False
+    )
+
+
+def read_table(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY ticker, date").fetchall()
+
+
+def test_sqlite_store_upserts_into_declared_tables(tmp_path):
+    database = tmp_path / "aligned_data.db"
+    data = wide_data()[:3]
+    data["Volume_SPY"] = [100.0, np.nan, 300.0]
+    # A relative database lives in the output directory
+    formats = {"sqlite": {"database": "aligned_data.db"}}
+    DataSaver.save_data(data, tmp_path, formats=formats)
+
+    with sqlite3.connect(database) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT date, close FROM yahoo_data "
+            "WHERE ticker = ? AND date BETWEEN ? AND ?",
+            ["SPY", "2019-12-02", "2019-12-31"],
+        ).fetchall()
+    assert "COVERING INDEX yahoo_data_ticker_date" in plan[0][-1]
+    assert read_table(database, "yahoo_data")[:2] == [
+        ("2019-12-02", "SPY", None, None, None, 0.0, 100),
+        ("2019-12-03", "SPY", None, None, None, 1.0, None),
+    ]
+    assert read_table(database, "fred_data") == [
+        ("2019-12-02", "DGS10", 1.0, None),
+        ("2019-12-04", "DGS10", 1.0, None),
+    ]
+
+    # Rows outside the new frame are kept; the overlapping ones are updated
+    DataSaver.save_data(data[1:] + 10, tmp_path, name="revised", formats=formats)
+    closes = [row[5] for row in read_table(database, "yahoo_data")]
+    assert closes == [0.0, 11.0, 12.0, 100.0, 111.0, 112.0]
+
+    # Limited to fred_data, a save leaves the Yahoo rows alone
+    fred_only = {"sqlite": {"database": "aligned_data.db", "tables": ["fred_data"]}}
+    DataSaver.save_data(data + 20, tmp_path, name="fred", formats=fred_only)
+    closes = [row[5] for row in read_table(database, "yahoo_data")]
+    assert closes == [0.0, 11.0, 12.0, 100.0, 111.0, 112.0]
+    assert [row[2] for row in read_table(database, "fred_data")] == [21.0, 21.0]
+
+
+def test_sqlite_append_replaces_tail(tmp_path):
+    full = wide_data()[["Close_SPY", "Value_DGS10"]]
+    DataSaver.save_data(full[:10], tmp_path, formats=["sqlite"])
+    DataSaver.append_data(full[5:8] * 2, tmp_path, formats=["sqlite"])
+
+    rows = read_table(tmp_path / "merged_data.db", "yahoo_data")
+    assert [row[5] for row in rows] == [0, 1, 2, 3, 4, 10, 12, 14]
+    assert os.path.exists(tmp_path / "merged_data.hash.json")
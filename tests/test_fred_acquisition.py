@@ -2,8 +2,10 @@ import os
 from unittest.mock import patch
 
 import pandas as pd
+import pytest
 
 from acquisition import FredAcquisition
+from merging import DataMerger
 
 
 @patch("acquisition.FredAcquisition.fetch_series")
@@ -30,3 +32,155 @@ def test_fred_acquisition(mock_fetch_series, tmp_path):
     assert all(
         col in ohlcv_data.columns for col in ["Open", "High", "Low", "Close", "Volume"]
     )
+
+
+class FakeFred:
+    """Serves a daily series and records every requested range."""
+
+    def __init__(self):
+        index = pd.date_range("2019-01-01", "2021-12-31", freq="D")
+        self.series = pd.Series(range(len(index)), index=index, dtype=float)
+        self.requests = []
+
+    def get_series(self, series_id, observation_start=None, observation_end=None):
+        self.requests.append(
+            (pd.Timestamp(observation_start), pd.Timestamp(observation_end))
+        )
+        return self.series.loc[observation_start:observation_end]
+
+
+def test_fred_cache_serves_and_extends_cached_ranges(tmp_path):
+    fake = FakeFred()
+    fred = FredAcquisition("test_api_key", cache_dir=tmp_path, fred_client=fake)
+    fred.fetch_series("DGS10", "2020-01-01", "2020-12-31")
+
+    # A sub-range of the cached file is sliced without hitting the API
+    subset = fred.fetch_series("DGS10", "2020-03-01", "2020-03-10")
+    assert len(fake.requests) == 1
+    assert subset.index.min() == pd.Timestamp("2020-03-01")
+    assert subset.index.max() == pd.Timestamp("2020-03-10")
+
+    # A partially covered request only fetches the missing tail
+    extended = fred.fetch_series("DGS10", "2020-06-01", "2021-01-31")
+    assert fake.requests[-1] == (pd.Timestamp("2021-01-01"), pd.Timestamp("2021-01-31"))
+    assert extended["Value"].equals(
+        fake.series.loc["2020-06-01":"2021-01-31"].rename("Value")
+    )
+    assert sorted(os.listdir(tmp_path)) == [
+        "DGS10_2020-01-01_2021-01-31.feather",
+        "cache_manifest.json",
+    ]
+
+
+def test_disjoint_request_only_fetches_its_own_window(tmp_path):
+    fake = FakeFred()
+    fred = FredAcquisition("test_api_key", cache_dir=tmp_path, fred_client=fake)
+    fred.fetch_series("DGS10", "2019-01-01", "2019-03-31")
+
+    # Nothing between the cached range and the request is downloaded
+    data = fred.fetch_series("DGS10", "2021-01-01", "2021-03-31")
+    assert fake.requests[1:] == [
+        (pd.Timestamp("2021-01-01"), pd.Timestamp("2021-03-31"))
+    ]
+    assert data["Value"].equals(
+        fake.series.loc["2021-01-01":"2021-03-31"].rename("Value")
+    )
+    assert sorted(os.listdir(tmp_path)) == [
+        "DGS10_2019-01-01_2019-03-31.feather",
+        "DGS10_2021-01-01_2021-03-31.feather",
+        "cache_manifest.json",
+    ]
+
+    # A request bridging both ranges fetches the gap and joins them in one file
+    fred.fetch_series("DGS10", "2019-02-01", "2021-02-28")
+    assert fake.requests[2:] == [
+        (pd.Timestamp("2019-04-01"), pd.Timestamp("2020-12-31"))
+    ]
+    assert sorted(os.listdir(tmp_path)) == [
+        "DGS10_2019-01-01_2021-03-31.feather",
+        "cache_manifest.json",
+    ]
+
+
+def test_parallel_fetch_all_series_keeps_order(tmp_path):
+    fake = FakeFred()
+    series_ids = ["DGS10", "BAMLH0A0HYM2", "T10Y2Y", "DFF"]
+    fred = FredAcquisition(
+        "test_api_key", cache_dir=tmp_path, fred_client=fake, max_workers=4
+    )
+
+    fred_data_dict = fred.fetch_all_series(series_ids, "2020-01-01", "2020-01-31")
+
+    assert list(fred_data_dict) == series_ids
+    assert len(fake.requests) == len(series_ids)
+    assert all(len(ohlcv) == 31 for ohlcv in fred_data_dict.values())
+
+
+def test_csv_cache_is_migrated_to_feather(tmp_path):
+    cached = pd.DataFrame(
+        {"Value": [1.5, 1.6, 1.7]},
+        index=pd.to_datetime(["2020-01-02", "2020-01-03", "2020-01-06"]),
+    ).rename_axis("Date")
+    cached.to_csv(os.path.join(tmp_path, "DGS10_2020-01-01_2020-01-31.csv"))
+    fake = FakeFred()
+    fred = FredAcquisition("test_api_key", cache_dir=tmp_path, fred_client=fake)
+
+    data = fred.fetch_series("DGS10", "2020-01-01", "2020-01-31")
+
+    assert fake.requests == []
+    pd.testing.assert_frame_equal(data, cached, check_freq=False)
+    assert sorted(os.listdir(tmp_path)) == [
+        "DGS10_2020-01-01_2020-01-31.feather",
+        "cache_manifest.json",
+    ]
+
+
+class StaticFred:
+    """Serves one fixed series, gaps included."""
+
+    def __init__(self, series):
+        self.series = series
+
+    def get_series(self, series_id, observation_start=None, observation_end=None):
+        return self.series.loc[observation_start:observation_end]
+
+
+def test_asof_merge_never_sees_later_observations(tmp_path):
+    dates = pd.to_datetime(["2020-01-02", "2020-01-03", "2020-01-06", "2020-01-07"])
+    yahoo_data = pd.DataFrame(
+        {"Close_SPY": 1.0}, index=pd.bdate_range(dates[0], periods=6)
+    )
+    series_options = {"DGS10": {"frequency": "D", "release_lag": "1D"}}
+
+    merged = []
+    for last in (10.0, 99.0):
+        series = pd.Series([1.0, float("nan"), float("nan"), last], index=dates)
+        fred = FredAcquisition(
+            "test_api_key",
+            cache_dir=tmp_path / str(last),
+            fred_client=StaticFred(series),
+        )
+        fred_data_dict = fred.fetch_all_series(["DGS10"], "2020-01-01", "2020-01-10")
+        merged.append(
+            DataMerger.merge_datasets(
+                yahoo_data.copy(),
+                fred_data_dict,
+                alignment="asof",
+                series_options=series_options,
+            )["Value_DGS10"]
+        )
+
+    # The last observation is released on the 8th; nothing before depends on it
+    assert merged[0]["2020-01-06"] == 1.0
+    pd.testing.assert_series_equal(merged[0][:"2020-01-07"], merged[1][:"2020-01-07"])
+    assert merged[1]["2020-01-08"] == 99.0
+
+
+def test_unknown_cache_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported cache_format"):
+        FredAcquisition(
+            "test_api_key",
+            cache_dir=tmp_path,
+            fred_client=FakeFred(),
+            cache_format="parquet",
+        )
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gap_fill import GapMask, fill_frame, fill_gaps
+from saving import ArrowSink, DataSaver
+
+
+def test_fill_gaps_matches_pandas_per_policy():
+    nan = np.nan
+    data = pd.DataFrame(
+        {
+            "a": [nan, 1.0, nan, nan, 4.0, nan],
+            "b": [nan, 1.0, nan, nan, 4.0, nan],
+            "c": [nan, 1.0, nan, nan, 4.0, nan],
+        }
+    )
+    expected = pd.DataFrame(
+        {
+            "a": data["a"].interpolate().bfill(),
+            "b": data["b"].ffill().bfill(),
+            "c": data["c"],
+        }
+    )
+    missing = data.isna().to_numpy()
+
+    mask = fill_frame(data, {"a": "interpolate", "b": "forward_fill", "c": "flag"})
+
+    pd.testing.assert_frame_equal(data, expected)
+    assert (mask.unpack() == missing).all()
+    assert mask.count() == {"a": 4, "b": 4, "c": 4}
+    assert mask.bits.shape == (1, 3)
+
+
+def test_fill_gaps_continues_from_seed_and_ahead():
+    block = np.array([[np.nan, np.nan], [2.0, np.nan], [np.nan, np.nan]])
+
+    fill_gaps(
+        block,
+        "interpolate",
+        ["x", "y"],
+        seed={"x": 0.0, "y": 10.0},
+        ahead={"x": (4, 8.0), "y": (4, 20.0)},
+    )
+
+    # x runs 0 (seed) -> 2 -> 8 at row 4, y from 10 at row -1 to 20 at row 4
+    np.testing.assert_allclose(block[:, 0], [1.0, 2.0, 4.0])
+    np.testing.assert_allclose(block[:, 1], [12.0, 14.0, 16.0])
+
+
+def test_gap_mask_round_trips(tmp_path):
+    missing = np.zeros((20, 2), dtype=bool)
+    missing[[0, 9, 19], 1] = True
+    mask = GapMask(np.packbits(missing, axis=0), 20, ["a", "b"])
+
+    mask.save(tmp_path / "mask.npz")
+    loaded = GapMask.load(tmp_path / "mask.npz")
+
+    assert loaded.columns == ["a", "b"]
+    assert (loaded.unpack() == missing).all()
+    assert loaded.column("b").nonzero()[0].tolist() == [0, 9, 19]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported missing_data_handling"):
+        fill_gaps(np.zeros((2, 1)), "mean")
+
+
+def test_budgeted_passes_fill_like_one_pass():
+    rng = np.random.default_rng(0)
+    block = rng.random((50, 12))
+    block[rng.random(block.shape) < 0.3] = np.nan
+    policies = ["interpolate", "forward_fill", "flag"] * 4
+    one_pass = block.copy()
+    expected = fill_gaps(one_pass, policies)
+
+    # A budget this small fills one column per pass
+    mask = fill_gaps(block, policies, memory_budget=1)
+
+    np.testing.assert_array_equal(block, one_pass)
+    assert (mask.bits == expected.bits).all()
+
+
+def test_fill_frame_leaves_frames_sharing_its_storage_alone(tmp_path):
+    nan = np.nan
+    data = pd.DataFrame({"a": [1.0, nan, 3.0], "b": [nan, 2.0, nan]})
+    shallow = data.copy(deep=False)
+    selected = data[["a"]]
+
+    fill_frame(data, "forward_fill")
+
+    assert data["a"].tolist() == [1.0, 1.0, 3.0]
+    assert data["b"].tolist() == [2.0, 2.0, 2.0]
+    assert shallow["a"].isna().tolist() == [False, True, False]
+    assert selected["a"].isna().tolist() == [False, True, False]
+
+    # A memory-mapped frame is read-only underneath and is filled all the same
+    path = tmp_path / "gaps.arrow"
+    ArrowSink().write(shallow, path)
+    loaded = DataSaver.load_arrow(path)
+    mask = fill_frame(loaded, "forward_fill")
+    pd.testing.assert_frame_equal(loaded, data.rename_axis("Date"))
+    assert mask.count() == {"a": 1, "b": 2}
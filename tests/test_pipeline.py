@@ -0,0 +1,86 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from pipeline import Stage, StageCache, StageGraph
+
+
+DATES = pd.bdate_range("2020-01-01", periods=3, name="Date")
+
+
+def counting_stages(calls, scale=2.0, barrier=None, combine_config=1):
+    def load():
+        calls.append("load")
+        return {"prices": pd.DataFrame({"Close_SPY": [1.0, 2.0, 3.0]}, index=DATES)}
+
+    def rates():
+        calls.append("rates")
+        if barrier is not None:
+            barrier.wait()
+        return {"rates": {"DGS10": pd.DataFrame({"Value": [0.5, 0.6, 0.7]}, DATES)}}
+
+    def combine(prices, rates):
+        calls.append("combine")
+        return {"total": float((prices["Close_SPY"] * rates["DGS10"]["Value"]).sum())}
+
+    return [
+        Stage(
+            "combine", combine, ["prices", "rates"], ["total"], config=combine_config
+        ),
+        Stage("load", load, outputs=["prices"], config={"scale": scale}),
+        Stage("rates", rates, outputs=["rates"]),
+    ]
+
+
+def test_unchanged_stages_are_loaded_from_cache(tmp_path):
+    calls = []
+    artifacts, plan = StageGraph(counting_stages(calls)).run(StageCache(tmp_path))
+    assert [entry["stage"] for entry in plan] == ["load", "rates", "combine"]
+    assert artifacts["total"] == pytest.approx(3.8)
+
+    calls.clear()
+    artifacts, plan = StageGraph(counting_stages(calls)).run(StageCache(tmp_path))
+    assert calls == []
+    assert {entry["status"] for entry in plan} == {"cached"}
+    assert artifacts["total"] == pytest.approx(3.8)
+    # Inputs are released once every stage taking them has run
+    assert "rates" not in artifacts
+
+    # A config change reruns the stage; identical output keeps the rest cached
+    calls.clear()
+    _, plan = StageGraph(counting_stages(calls, scale=3.0)).run(StageCache(tmp_path))
+    assert calls == ["load"]
+    assert [entry["status"] for entry in plan] == ["executed", "cached", "cached"]
+
+    # combine reruns on the inputs loaded back from the cache
+    calls.clear()
+    stages = counting_stages(calls, scale=3.0, combine_config=2)
+    artifacts, _ = StageGraph(stages).run(StageCache(tmp_path))
+    assert calls == ["combine"]
+    assert artifacts["total"] == pytest.approx(3.8)
+
+
+def test_independent_stages_run_concurrently(tmp_path):
+    # rates waits for combine to start, which only a concurrent run can satisfy
+    barrier = threading.Barrier(2, timeout=10)
+    calls = []
+    stages = counting_stages(calls, barrier=barrier)
+    stages[0].inputs = ["prices"]
+    stages[0].run = lambda prices: (barrier.wait(), {"total": 0.0})[1]
+
+    _, plan = StageGraph(stages).run(max_workers=2)
+
+    assert {entry["status"] for entry in plan} == {"executed"}
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="No stage produces"):
+        StageGraph([Stage("a", dict, inputs=["missing"])])
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph(
+            [
+                Stage("a", dict, inputs=["b_out"], outputs=["a_out"]),
+                Stage("b", dict, inputs=["a_out"], outputs=["b_out"]),
+            ]
+        )
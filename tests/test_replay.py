@@ -0,0 +1,206 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+import toml
+
+import sqlite_store
+from acquisition import YahooAcquisition
+from data_orchestrator import Orchestrator
+from merging import DataMerger
+from replay import FixtureStore, ReplayDownloader
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "replay")
+
+
+def write_replay_config(tmp_path, output=None, **settings):
+    config = {
+        "sources": {
+            "Yahoo_Finance": {"tickers": ["SPY", "UPRO"], "batch_size": 2},
+            "FRED": {"series_ids": ["BAMLH0A0HYM2", "DGS10"]},
+        },
+        "date_ranges": {"start_date": "2020-01-01", "end_date": "2020-12-31"},
+        "output": {"output_dir": str(tmp_path), **(output or {})},
+        "settings": {"missing_data_handling": "interpolate", **settings},
+        "replay": {"mode": "replay", "fixtures_dir": FIXTURES_DIR},
+    }
+    config_path = os.path.join(tmp_path, "config.toml")
+    with open(config_path, "w") as f:
+        toml.dump(config, f)
+    return config_path
+
+
+def test_orchestrator_runs_offline_from_fixtures(tmp_path):
+    Orchestrator(config_path=write_replay_config(tmp_path)).run()
+
+    merged = pd.read_parquet(os.path.join(tmp_path, "merged_data.parquet"))
+    assert {"Close_SPY", "Close_UPRO", "Value_DGS10"} <= set(merged.columns)
+    assert len(merged) > 200
+
+
+def test_orchestrator_skips_unchanged_stages(tmp_path):
+    config_path = write_replay_config(tmp_path)
+    first = Orchestrator(config_path=config_path).run()
+    merged_path = os.path.join(tmp_path, "merged_data.parquet")
+    mtime = os.path.getmtime(merged_path)
+
+    second = Orchestrator(config_path=config_path).run()
+
+    assert [entry["stage"] for entry in first] == ["dates", "yahoo", "fred", "merge"]
+    assert {entry["status"] for entry in first} == {"executed"}
+    assert {entry["status"] for entry in second} == {"cached"}
+    assert os.path.getmtime(merged_path) == mtime
+
+    # The merge reruns once its output is gone
+    os.remove(merged_path)
+    third = Orchestrator(config_path=config_path).run()
+    assert [entry["status"] for entry in third] == ["cached"] * 3 + ["executed"]
+    assert os.path.exists(merged_path)
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{"revision_window": 10}, {"missing_data_handling": "forward_fill"}],
+)
+def test_merge_settings_only_rerun_the_merge(tmp_path, settings):
+    Orchestrator(config_path=write_replay_config(tmp_path)).run()
+
+    plan = Orchestrator(config_path=write_replay_config(tmp_path, **settings)).run()
+
+    assert [entry["status"] for entry in plan] == ["cached"] * 3 + ["executed"]
+
+
+def test_yahoo_keeps_forward_fill_unless_configured(tmp_path, monkeypatch):
+    policies = []
+    init = YahooAcquisition.__init__
+
+    def recording_init(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        policies.append(self.missing_data_handling)
+
+    monkeypatch.setattr(YahooAcquisition, "__init__", recording_init)
+    # settings.missing_data_handling is "interpolate", which only applies to FRED
+    Orchestrator(config_path=write_replay_config(tmp_path, stage_cache=False)).run()
+
+    assert policies == ["forward_fill"]
+
+
+def test_incremental_merge_reads_state_from_csv_output(tmp_path, monkeypatch):
+    config_path = write_replay_config(
+        tmp_path, {"formats": ["csv"]}, stage_cache=False, merge_mode="incremental"
+    )
+    csv_path = os.path.join(tmp_path, "merged_data.csv")
+    Orchestrator(config_path=config_path).run()
+    full = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    calls = []
+    merge_incremental = DataMerger.merge_incremental
+
+    def recording_merge_incremental(existing, *args, **kwargs):
+        calls.append(len(existing))
+        return merge_incremental(existing, *args, **kwargs)
+
+    monkeypatch.setattr(DataMerger, "merge_incremental", recording_merge_incremental)
+    Orchestrator(config_path=config_path).run()
+
+    assert calls == [len(full)]
+    assert not os.path.exists(os.path.join(tmp_path, "merged_data.parquet"))
+    pd.testing.assert_frame_equal(
+        pd.read_csv(csv_path, index_col=0, parse_dates=True), full
+    )
+
+    # Without a wide output there is no stored merge to extend
+    config_path = write_replay_config(
+        tmp_path, {"formats": ["sqlite"]}, merge_mode="incremental"
+    )
+    with pytest.raises(ValueError, match="merge_mode = \"incremental\""):
+        Orchestrator(config_path=config_path)
+
+
+def test_shared_sqlite_store_gets_yahoo_rows_once(tmp_path, monkeypatch):
+    output = {
+        "formats": ["parquet", "sqlite"],
+        "sqlite": {"database": "aligned_data.db"},
+    }
+    config_path = write_replay_config(tmp_path, output, stage_cache=False)
+    writes = []
+    write_frame = sqlite_store.write_frame
+
+    def recording_write_frame(path, data, **kwargs):
+        counts = write_frame(path, data, **kwargs)
+        writes.append((path, sorted(counts)))
+        return counts
+
+    monkeypatch.setattr(sqlite_store, "write_frame", recording_write_frame)
+    Orchestrator(config_path=config_path).run()
+
+    database = os.path.join(tmp_path, "aligned_data.db")
+    assert writes == [(database, ["yahoo_data"]), (database, ["fred_data"])]
+
+
+def test_orchestrator_hands_frames_over_in_memory(tmp_path, monkeypatch):
+    config_path = write_replay_config(
+        tmp_path,
+        stage_cache=False,
+        artifact_memory_budget=1,
+        persist_artifacts=["yahoo_data"],
+    )
+
+    def no_read_back(*args, **kwargs):
+        raise AssertionError("stages must not re-read their own CSV exports")
+
+    monkeypatch.setattr(pd, "read_csv", no_read_back)
+    Orchestrator(config_path=config_path).run()
+    monkeypatch.undo()
+
+    # Everything over the budget was spilled, and only the persisted frame is kept
+    artifacts_dir = os.path.join(tmp_path, "artifacts")
+    assert os.listdir(artifacts_dir) == ["yahoo_data.arrow"]
+    merged = pd.read_parquet(os.path.join(tmp_path, "merged_data.parquet"))
+    assert {"Close_SPY", "Value_DGS10"} <= set(merged.columns)
+
+
+def test_orchestrator_runs_stages_concurrently(tmp_path):
+    config_path = write_replay_config(tmp_path, concurrent_stages=True)
+    orchestrator = Orchestrator(config_path=config_path)
+
+    # Each stage waits for the other to start; a sequential run would time out
+    barrier = threading.Barrier(2, timeout=10)
+    run_yahoo_stage = orchestrator.run_yahoo_stage
+    run_fred_stage = orchestrator.run_fred_stage
+
+    def wait_then(stage):
+        def wrapper(*args):
+            barrier.wait()
+            return stage(*args)
+
+        return wrapper
+
+    orchestrator.run_yahoo_stage = wait_then(run_yahoo_stage)
+    orchestrator.run_fred_stage = wait_then(run_fred_stage)
+    orchestrator.run()
+
+    assert os.path.exists(os.path.join(tmp_path, "merged_data.parquet"))
+
+
+def test_replay_injects_latency_and_failures(tmp_path):
+    downloader = ReplayDownloader(
+        FixtureStore(FIXTURES_DIR), latency=0.01, fail_symbols=["UPRO"]
+    )
+    yahoo = YahooAcquisition(
+        ["SPY", "UPRO"],
+        "2020-01-01",
+        "2020-06-30",
+        tmp_path,
+        retries=1,
+        downloader=downloader,
+    )
+
+    data = yahoo.fetch_data()
+
+    assert yahoo.failed_tickers == ["UPRO"]
+    assert data.index.max() < pd.Timestamp("2020-06-30", tz="UTC")
+    assert downloader.requests == 2
+
+    with pytest.raises(KeyError):
+        downloader("MISSING")
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from sqlite_query import StoreReader
+from sqlite_store import write_frame
+
+
+def wide_data():
+    dates = pd.bdate_range("2020-01-01", periods=30, name="Date")
+    return pd.DataFrame(
+        {
+            "Close_SPY": range(30),
+            "Volume_SPY": range(1000, 1030),
+            "Close_TLT": range(100, 130),
+            "Value_DGS10": [1.5, None] * 15,
+        },
+        index=dates,
+        dtype=float,
+    )
+
+
+def test_query_pivots_a_date_range(tmp_path):
+    path = tmp_path / "store.db"
+    data = wide_data()
+    write_frame(path, data)
+
+    with StoreReader(path, fetch_rows=4) as reader:
+        result = reader.query(
+            ["TLT", "SPY", "DGS10"],
+            ["Close", "Value"],
+            start="2020-01-06",
+            end="2020-01-31",
+        )
+
+    expected = data.loc["2020-01-06":"2020-01-31", ["Close_TLT", "Close_SPY"]]
+    expected["Value_DGS10"] = data.loc["2020-01-06":"2020-01-31", "Value_DGS10"]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+def test_query_cache_follows_store_version(tmp_path):
+    path = tmp_path / "store.db"
+    data = wide_data()
+    write_frame(path, data)
+
+    with StoreReader(path, cache_size=1) as reader:
+        first = reader.query(["SPY"], ["Close", "Volume"])
+        first["Close_SPY"] = 0.0
+        again = reader.query(["SPY"], ["Close", "Volume"])
+        assert (reader.hits, reader.misses) == (1, 1)
+        pd.testing.assert_frame_equal(
+            again, data[["Close_SPY", "Volume_SPY"]], check_freq=False
+        )
+
+        write_frame(path, data[-1:] + 1)
+        updated = reader.query(["SPY"], ["Close", "Volume"])
+        assert reader.misses == 2
+        assert updated["Close_SPY"].iloc[-1] == 30.0
+
+        reader.query(["TLT"])
+        reader.query(["SPY"], ["Close", "Volume"])
+        # The cache holds one entry, so the SPY result was evicted
+        assert reader.misses == 4
+
+
+def test_unknown_field_is_rejected(tmp_path):
+    path = tmp_path / "store.db"
+    write_frame(path, wide_data())
+    with StoreReader(path) as reader, pytest.raises(ValueError, match="Unsupported"):
+        reader.query(["SPY"], ["Adj Close"])
@@ -5,6 +5,8 @@ import pytest
 import toml
 import vectorbt as vbt
 
+from saving import DataSaver
+
 
 @pytest.fixture
 def config():
@@ -17,6 +19,10 @@ def config():
 def merged_data(config):
     """Fixture to load the merged dataset for testing."""
     output_dir = config["output"]["output_dir"]
+    # The memory-mapped Arrow output loads without parsing when it was written
+    arrow_path = os.path.join(output_dir, "merged_data.arrow")
+    if os.path.exists(arrow_path):
+        return DataSaver.load_arrow(arrow_path)
     file_path = os.path.join(output_dir, "merged_data.csv")
     assert os.path.exists(file_path), f"File not found: {file_path}"
     data = pd.read_csv(file_path, index_col=0, parse_dates=True)
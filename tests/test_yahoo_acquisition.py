@@ -1,9 +1,17 @@
 import os
+import threading
+import time
+from unittest.mock import patch
 
 import pandas as pd
 import pytest
+import toml
 
 from acquisition import YahooAcquisition
+from gap_fill import fill_frame
+from saving import DataSaver
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config.toml")
 
 
 def test_yahoo_acquisition(tmp_path):
@@ -28,3 +36,178 @@ def test_yahoo_acquisition(tmp_path):
     assert all(
         col in df.columns for col in expected_columns
     ), "Missing expected ticker columns in CSV."
+
+
+def fake_frame(symbol):
+    index = pd.to_datetime(
+        ["2020-01-02", "2020-01-03", "2020-01-06", "2020-01-07", "2020-01-08"]
+    )
+    base = float(len(symbol))
+    return pd.DataFrame(
+        {
+            "Open": [base + i for i in range(5)],
+            "High": base + 1.0,
+            "Low": base - 1.0,
+            "Close": base + 0.5,
+            "Volume": [100] * 5,
+        },
+        index=index,
+    )
+
+
+class FakeYFData:
+    """Minimal stand-in for vbt.YFData exposing the `get` accessor."""
+
+    def __init__(self, symbols):
+        self.symbols = symbols if isinstance(symbols, list) else [symbols]
+        self.data = {symbol: fake_frame(symbol) for symbol in self.symbols}
+
+    def get(self, column):
+        if len(self.symbols) == 1:
+            return self.data[self.symbols[0]][column]
+        columns = column if isinstance(column, list) else [column]
+        frames = tuple(
+            pd.DataFrame({s: self.data[s][c] for s in self.symbols}) for c in columns
+        )
+        return frames if isinstance(column, list) else frames[0]
+
+
+def fake_download(symbols, start=None, end=None):
+    if "BAD" in (symbols if isinstance(symbols, list) else [symbols]):
+        raise ValueError("delisted")
+    data = FakeYFData(symbols)
+    if start is not None:
+        data.data = {s: frame.loc[start:] for s, frame in data.data.items()}
+    return data
+
+
+@patch("acquisition.vbt.YFData.download", side_effect=fake_download)
+def test_concurrent_fetch_matches_serial(mock_download, tmp_path):
+    tickers = ["SPY", "UPRO", "BAD", "TLT"]
+    serial = YahooAcquisition(tickers, "2020-01-01", "2020-12-31", tmp_path, retries=1)
+    concurrent = YahooAcquisition(
+        tickers, "2020-01-01", "2020-12-31", tmp_path, max_workers=3, retries=1
+    )
+
+    pd.testing.assert_frame_equal(serial.fetch_data(), concurrent.fetch_data())
+    assert concurrent.failed_tickers == ["BAD"]
+    assert serial.failed_tickers == ["BAD"]
+
+
+@patch("acquisition.vbt.YFData.download", side_effect=fake_download)
+def test_batched_fetch_matches_serial(mock_download, tmp_path):
+    tickers = ["SPY", "UPRO", "SSO", "BAD", "TLT"]
+    serial = YahooAcquisition(tickers, "2020-01-01", "2020-12-31", tmp_path, retries=1)
+    batched = YahooAcquisition(
+        tickers, "2020-01-01", "2020-12-31", tmp_path, retries=1, batch_size=3
+    )
+
+    pd.testing.assert_frame_equal(serial.fetch_data(), batched.fetch_data())
+    # The failing batch falls back to per-symbol fetches
+    assert batched.failed_tickers == ["BAD"]
+
+
+def test_default_config_downloads_concurrently(tmp_path):
+    yahoo_config = toml.load(CONFIG_PATH)["sources"]["Yahoo_Finance"]
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def counting_download(symbols, start=None, end=None):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return fake_download(symbols, start, end)
+
+    yahoo = YahooAcquisition(
+        yahoo_config["tickers"],
+        "2020-01-01",
+        "2020-12-31",
+        tmp_path,
+        max_workers=yahoo_config["max_workers"],
+        retries=1,
+        batch_size=yahoo_config["batch_size"],
+        downloader=counting_download,
+    )
+    data = yahoo.fetch_data()
+
+    assert peak[0] == yahoo_config["max_workers"]
+    assert len(data.columns) == 5 * len(yahoo_config["tickers"])
+
+
+@patch("acquisition.vbt.YFData.download", side_effect=fake_download)
+def test_incremental_fetch_only_requests_tail(mock_download, tmp_path):
+    tickers = ["SPY", "UPRO"]
+    yahoo = YahooAcquisition(tickers, "2020-01-01", "2020-12-31", tmp_path, retries=1)
+    full = yahoo.fetch_data()
+
+    # Stored data covers the first three SPY bars, the last one since revised
+    stored = full[["Open_SPY", "High_SPY", "Low_SPY", "Close_SPY", "Volume_SPY"]]
+    stored = stored.iloc[:3].copy()
+    stored.iloc[-1, 0] = -1.0
+    stored_path = os.path.join(tmp_path, "yahoo_data.parquet")
+    stored.to_parquet(stored_path)
+
+    mock_download.reset_mock()
+    data = yahoo.fetch_incremental(stored_path, overlap_days=1)
+
+    starts = {
+        call.args[0]: call.kwargs["start"] for call in mock_download.call_args_list
+    }
+    assert starts["SPY"] == stored.index[1]
+    assert starts["UPRO"] == "2020-01-01"
+    pd.testing.assert_frame_equal(data, full, check_names=False)
+
+
+@patch("acquisition.vbt.YFData.download", side_effect=fake_download)
+def test_incremental_refresh_skips_filled_bars_and_appends(mock_download, tmp_path):
+    yahoo = YahooAcquisition(["SPY"], "2020-01-01", "2020-12-31", tmp_path, retries=1)
+    full = yahoo.fetch_data()
+
+    # The stored last SPY close is a forward-filled gap, not a real bar
+    stored = full.iloc[:4].copy()
+    stored.iloc[-1, stored.columns.get_loc("Close_SPY")] = float("nan")
+    gap_mask = fill_frame(stored, "forward_fill")
+    DataSaver.save_data(stored, tmp_path, name="yahoo_data")
+    DataSaver.save_gap_mask(gap_mask, tmp_path, name="yahoo_data")
+
+    mock_download.reset_mock()
+    with patch.object(DataSaver, "append_data", wraps=DataSaver.append_data) as append:
+        data = yahoo.fetch_incremental(overlap_days=1)
+        yahoo.save_data(data)
+
+    # One bar before the last observed one, which is the third row
+    assert mock_download.call_args.kwargs["start"] == full.index[1]
+    assert yahoo.refresh_start == full.index[1]
+    pd.testing.assert_frame_equal(data, full, check_names=False)
+    appended = append.call_args.args[0]
+    pd.testing.assert_frame_equal(appended, full.iloc[1:], check_names=False)
+    saved = pd.read_parquet(os.path.join(tmp_path, "yahoo_data.parquet"))
+    pd.testing.assert_frame_equal(saved, full, check_names=False, check_freq=False)
+
+
+@patch("acquisition.vbt.YFData.download", side_effect=fake_download)
+def test_cached_fetch_skips_download(mock_download, tmp_path):
+    cache_dir = os.path.join(tmp_path, "cache")
+    args = ("2020-01-01", "2020-12-31", tmp_path)
+    uncached = YahooAcquisition(["SPY", "UPRO", "TLT"], *args, retries=1).fetch_data()
+
+    # Warm the cache for UPRO only, then fetch the whole batch
+    YahooAcquisition(["UPRO"], *args, retries=1, cache_dir=cache_dir).fetch_data()
+    mock_download.reset_mock()
+    yahoo = YahooAcquisition(
+        ["SPY", "UPRO", "TLT"], *args, retries=1, batch_size=3, cache_dir=cache_dir
+    )
+    data = yahoo.fetch_data()
+
+    mock_download.assert_called_once()
+    assert mock_download.call_args.args[0] == ["SPY", "TLT"]
+    pd.testing.assert_frame_equal(data, uncached)
+
+    # An expired entry is downloaded again
+    mock_download.reset_mock()
+    yahoo.cache_ttl = -1
+    yahoo.fetch_data()
+    assert mock_download.call_args.args[0] == ["SPY", "UPRO", "TLT"]
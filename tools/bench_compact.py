@@ -0,0 +1,56 @@
+"""Compare the wide merged layout with the compact long layout in memory and on disk.
+
+    python tools/bench_compact.py data/merged_data.parquet
+
+Reports the in-memory size, the Parquet file size and the conversion times of
+the wide frame, the compact long frame and the compact frame with float32 prices.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from compact import memory_bytes, to_long, to_wide  # noqa: E402
+from saving import DataSaver  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compact layout.")
+    parser.add_argument("parquet_path", help="Wide merged Parquet file.")
+    args = parser.parse_args()
+
+    wide = pd.read_parquet(args.parquet_path)
+    print(f"{args.parquet_path}: {wide.shape[0]} dates x {wide.shape[1]} columns")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        layouts = [
+            ("wide", "parquet", {}),
+            ("compact", "compact", {}),
+            ("compact float32", "compact", {"float32_prices": True}),
+        ]
+        for label, fmt, options in layouts:
+            start = time.perf_counter()
+            frame = wide if fmt == "parquet" else to_long(wide, **options)
+            convert = time.perf_counter() - start
+            name = label.replace(" ", "_")
+            report = DataSaver.save_data(wide, output_dir, name, {fmt: options})
+            timing = f", to_long {convert * 1e3:.2f} ms" if frame is not wide else ""
+            print(
+                f"{label:16s} memory {memory_bytes(frame) / 1e3:9.1f} kB, "
+                f"disk {report[fmt]['bytes'] / 1e3:9.1f} kB{timing}"
+            )
+
+        long_data = to_long(wide)
+        start = time.perf_counter()
+        to_wide(long_data)
+        print(f"to_wide {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare cold and warm load times of the FRED cache in CSV and Feather format.
+
+    python tools/bench_fred_cache.py cache/BAMLH0A0HYM2_1997-01-02_2025-01-17.csv
+
+"Cold" is the first load of a freshly written file in a new acquisition object,
+"warm" is the median of repeated loads of the same file.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from acquisition import FredAcquisition  # noqa: E402
+
+
+def time_load(fred, path, repeat):
+    start = time.perf_counter()
+    fred._read_cache(path)
+    cold = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fred._read_cache(path)
+        timings.append(time.perf_counter() - start)
+    return cold, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FRED cache formats.")
+    parser.add_argument("csv_path", help="Existing CSV cache file to convert.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    source = pd.read_csv(args.csv_path, index_col="Date", parse_dates=True)
+    stem = os.path.splitext(os.path.basename(args.csv_path))[0]
+    print(f"{stem}: {len(source)} rows")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for cache_format in ["csv", "feather"]:
+            fred = FredAcquisition(
+                "unused", cache_dir, fred_client=object(), cache_format=cache_format
+            )
+            path = os.path.join(cache_dir, f"{stem}.{cache_format}")
+            if cache_format == "csv":
+                shutil.copy(args.csv_path, path)
+            else:
+                fred._write_cache(source, path)
+            cold, warm = time_load(fred, path, args.repeat)
+            print(
+                f"{cache_format:>8}: {os.path.getsize(path):>8} bytes, "
+                f"cold {cold * 1000:7.2f} ms, warm {warm * 1000:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
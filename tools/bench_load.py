@@ -0,0 +1,47 @@
+"""Compare loading the merged data from CSV, Parquet and the memory-mapped Arrow file.
+
+    python tools/bench_load.py data/merged_data.parquet --repeat 20
+
+The input is rewritten in every format to a temporary directory first.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from saving import DataSaver  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merged data loaders.")
+    parser.add_argument("parquet_path", help="Merged Parquet file to convert.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    data = pd.read_parquet(args.parquet_path)
+    with tempfile.TemporaryDirectory() as output_dir:
+        DataSaver.save_data(data, output_dir, formats=["csv", "parquet", "arrow"])
+        loaders = {
+            "csv": lambda path: pd.read_csv(path, index_col=0, parse_dates=True),
+            "parquet": pd.read_parquet,
+            "arrow": DataSaver.load_arrow,
+        }
+        for fmt, load in loaders.items():
+            path = os.path.join(output_dir, f"merged_data.{fmt}")
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                load(path)
+                timings.append(time.perf_counter() - start)
+            print(f"{fmt:8s} median {statistics.median(timings) * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark DataMerger.merge_datasets on a synthetic history.
+
+    python tools/bench_merge.py --dates 10000 --series 500
+
+With --memory-budget the streaming merge is also timed, writing its chunks to a
+temporary directory, and compared with a full merge followed by a save.
+
+The legacy per-date loop is timed on --loop-series series only and extrapolated,
+since running it over every series takes far too long to be practical.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from compact import memory_bytes  # noqa: E402
+from merging import DataMerger  # noqa: E402
+from saving import DataSaver  # noqa: E402
+
+
+def make_data(n_dates, n_series, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("1985-01-01", periods=n_dates)
+    yahoo_data = pd.DataFrame(
+        rng.random((n_dates, 5)),
+        index=dates,
+        columns=[f"{f}_SPY" for f in ["Open", "High", "Low", "Close", "Volume"]],
+    )
+    fred_data_dict = {}
+    for i in range(n_series):
+        # Drop ~5% of the dates so every series has misses to fill
+        keep = rng.random(n_dates) > 0.05
+        fred_data_dict[f"S{i:04d}"] = pd.DataFrame(
+            {"Value": rng.random(keep.sum())}, index=dates[keep]
+        )
+    return yahoo_data, fred_data_dict
+
+
+def loop_align(yahoo_data, fred_data):
+    aligned_data = pd.DataFrame(index=yahoo_data.index)
+    for date in yahoo_data.index:
+        if date in fred_data.index:
+            aligned_data.loc[date, "Value"] = fred_data.loc[date, "Value"]
+        else:
+            aligned_data.loc[date, "Value"] = None
+    return aligned_data
+
+
+def traced(func):
+    """Run func, returning its elapsed time and peak traced allocations."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_streaming(yahoo_data, fred_data_dict, args):
+    with tempfile.TemporaryDirectory() as output_dir:
+
+        def full():
+            merged_data = DataMerger.merge_datasets(
+                yahoo_data, fred_data_dict, alignment=args.alignment
+            )
+            DataSaver.save_data(merged_data, output_dir)
+
+        def streaming():
+            chunks = DataMerger.merge_chunks(
+                yahoo_data, fred_data_dict, args.memory_budget, args.alignment
+            )
+            DataSaver.save_chunks(chunks, output_dir)
+
+        # The inputs exist before tracing starts and are held outside the budget
+        resident = memory_bytes(yahoo_data) + sum(
+            memory_bytes(fred_data) for fred_data in fred_data_dict.values()
+        )
+        for label, func in [("full merge + save", full), ("streaming", streaming)]:
+            elapsed, peak = traced(func)
+            print(
+                f"{label}: {elapsed:.2f}s, peak allocations {peak / 1e6:.1f} MB "
+                f"+ {resident / 1e6:.1f} MB of inputs, "
+                f"budget {args.memory_budget / 1e6:.1f} MB"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the merge engine.")
+    parser.add_argument("--dates", type=int, default=10_000)
+    parser.add_argument("--series", type=int, default=500)
+    parser.add_argument("--loop-series", type=int, default=1)
+    parser.add_argument("--alignment", choices=["exact", "asof"], default="exact")
+    parser.add_argument(
+        "--memory-budget", type=int, help="also time the streaming merge (bytes)"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    yahoo_data, fred_data_dict = make_data(args.dates, args.series)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    merged_data = DataMerger.merge_datasets(
+        yahoo_data, fred_data_dict, alignment=args.alignment
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    output_bytes = merged_data.memory_usage(index=True).sum()
+    print(
+        f"merge_datasets ({args.alignment}): {args.dates} dates x {args.series} series -> "
+        f"{merged_data.shape} in {elapsed:.2f}s, peak allocations "
+        f"{peak / 1e6:.1f} MB for a {output_bytes / 1e6:.1f} MB output"
+    )
+
+    if args.memory_budget:
+        bench_streaming(yahoo_data, fred_data_dict, args)
+
+    start = time.perf_counter()
+    for series_name in list(fred_data_dict)[: args.loop_series]:
+        loop_align(yahoo_data, fred_data_dict[series_name])
+    per_series = (time.perf_counter() - start) / args.loop_series
+    print(
+        f"legacy per-date loop: {per_series:.2f}s per series, "
+        f"~{per_series * args.series:.0f}s extrapolated to {args.series} series"
+    )
+
+
+if __name__ == "__main__":
+    main()
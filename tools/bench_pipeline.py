@@ -0,0 +1,61 @@
+"""Benchmark Orchestrator.run offline against recorded Yahoo/FRED fixtures.
+
+Record fixtures once with `[replay] mode = "record"` in the config, then run e.g.
+    python tools/bench_pipeline.py --config config.toml --latency 0.2 --runs 3
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import toml
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from data_orchestrator import Orchestrator  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline offline.")
+    parser.add_argument("--config", required=True, help="Base TOML configuration.")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    config = toml.load(args.config)
+    config.setdefault("replay", {})
+    config["replay"].setdefault("fixtures_dir", "tests/fixtures/replay")
+    config["replay"].update(
+        mode="replay",
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+
+    timings = []
+    for run in range(args.runs):
+        with tempfile.TemporaryDirectory() as output_dir:
+            config["output"]["output_dir"] = output_dir
+            # Keep the Yahoo cache out of the timing so every run hits the stand-in
+            config["sources"]["Yahoo_Finance"].pop("cache_dir", None)
+            config_path = os.path.join(output_dir, "config.toml")
+            with open(config_path, "w") as f:
+                toml.dump(config, f)
+
+            start = time.perf_counter()
+            Orchestrator(config_path=config_path).run()
+            timings.append(time.perf_counter() - start)
+            print(f"run {run + 1}: {timings[-1]:.3f}s")
+
+    print(
+        f"latency={args.latency}s failure_rate={args.failure_rate}: "
+        f"min {min(timings):.3f}s, mean {sum(timings) / len(timings):.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
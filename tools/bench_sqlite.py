@@ -0,0 +1,95 @@
+"""Measure write throughput of the SQLite store against the legacy to_sql rewrite.
+
+    python tools/bench_sqlite.py --tickers 200 --days 2520 --batch-rows 50000
+
+Writes a synthetic OHLCV frame with `to_sql(if_exists="replace")` as the legacy
+`save_to_sqlite` does, then with the store's batched upserts into an empty and a
+populated database, and finally upserts only the last `--tail-days` days.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from compact import to_long  # noqa: E402
+from sqlite_store import write_frame  # noqa: E402
+
+
+def synthetic_data(tickers, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2000-01-03", periods=days, name="Date")
+    columns = {}
+    for i in range(tickers):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+        for field, values in [
+            ("Open", close * 0.999),
+            ("High", close * 1.01),
+            ("Low", close * 0.99),
+            ("Close", close),
+            ("Volume", rng.integers(1_000, 1_000_000, days).astype(float)),
+        ]:
+            columns[f"{field}_T{i:04d}"] = values
+    return pd.DataFrame(columns, index=dates)
+
+
+def timed(label, rows, write):
+    start = time.perf_counter()
+    write()
+    seconds = time.perf_counter() - start
+    print(f"{label:22s} {seconds:8.3f} s {rows / seconds:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite writes.")
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--days", type=int, default=2520)
+    parser.add_argument("--tail-days", type=int, default=5)
+    parser.add_argument("--batch-rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    data = synthetic_data(args.tickers, args.days)
+    rows = args.tickers * args.days
+    tail_rows = args.tickers * args.tail_days
+    print(f"{args.tickers} tickers x {args.days} days = {rows:,} rows")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        legacy_path = os.path.join(output_dir, "legacy.db")
+        long_data = to_long(data, downcast=False)
+        long_data["ticker"] = long_data["ticker"].astype(str)
+
+        def legacy():
+            with sqlite3.connect(legacy_path) as conn:
+                long_data.to_sql("yahoo_data", conn, if_exists="replace", index=False)
+
+        timed("legacy to_sql replace", rows, legacy)
+
+        store_path = os.path.join(output_dir, "store.db")
+        timed(
+            "upsert, empty store",
+            rows,
+            lambda: write_frame(store_path, data, batch_rows=args.batch_rows),
+        )
+        timed(
+            "upsert, full overwrite",
+            rows,
+            lambda: write_frame(store_path, data, batch_rows=args.batch_rows),
+        )
+        tail = data[-args.tail_days :] * 1.001
+        timed(
+            f"upsert, last {args.tail_days} days",
+            tail_rows,
+            lambda: write_frame(store_path, tail, batch_rows=args.batch_rows),
+        )
+        timed("legacy tail rewrite", rows, legacy)
+
+
+if __name__ == "__main__":
+    main()